@@ -0,0 +1,10 @@
+import pytest
+
+
+@pytest.fixture(autouse=True, scope='session')
+def yatube_test_environment():
+    """Временный кеш и миниатюры без пула, как у manage.py test."""
+    from core import testing
+
+    with testing.isolated():
+        yield
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
 
     name = 'core'
+
+    def ready(self):
+        from core import sqlite
+
+        connection_created.connect(sqlite.on_connection_created,
+                                   dispatch_uid='core.sqlite')
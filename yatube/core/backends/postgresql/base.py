@@ -0,0 +1,8 @@
+"""Бэкенд PostgreSQL с пулом и проверкой соединений из core.db."""
+from django.db.backends.postgresql import base
+
+from core.db import ConnectionMixin
+
+
+class DatabaseWrapper(ConnectionMixin, base.DatabaseWrapper):
+    pass
@@ -0,0 +1,8 @@
+"""Бэкенд SQLite с пулом и проверкой соединений из core.db."""
+from django.db.backends.sqlite3 import base
+
+from core.db import ConnectionMixin
+
+
+class DatabaseWrapper(ConnectionMixin, base.DatabaseWrapper):
+    pass
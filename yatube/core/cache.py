@@ -0,0 +1,241 @@
+"""
+Кеш в файле SQLite, общий для всех процессов на сервере.
+
+LocMemCache у каждого воркера свой: попадания делятся на число
+воркеров, а сдвиг версии ленты в одном процессе не виден другим.
+Этот бэкенд хранит записи в одной таблице файла LOCATION в режиме WAL,
+поэтому читатели не ждут писателей. Целые числа хранятся как INTEGER,
+и incr атомарен для всех процессов. Остальные значения сериализуются
+pickle.
+
+Размер ограничен числом записей (MAX_ENTRIES) и байтами (MAX_SIZE):
+примерно раз в CULL_EVERY записей удаляются просроченные и давно
+не читанные записи (LRU по времени последнего чтения).
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB, expires REAL,'
+    ' accessed REAL NOT NULL, size INTEGER NOT NULL) WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed)',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+)
+# Время чтения обновляется не чаще, чтобы get не писал на каждый вызов.
+TOUCH_INTERVAL = 1.0
+CHUNK = 500
+
+
+def encode(value):
+    if type(value) is int:
+        return value, 8
+    data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+    return data, len(data)
+
+
+def decode(value):
+    return value if isinstance(value, int) else pickle.loads(value)
+
+
+class SQLiteCache(BaseCache):
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location
+        self.max_size = options.get('MAX_SIZE')
+        self.cull_every = options.get('CULL_EVERY', 64)
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def connection(self) -> sqlite3.Connection:
+        # Соединение своё у каждого потока и у процесса после fork.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.location, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode = wal')
+            connection.execute('PRAGMA synchronous = off')
+            for statement in SCHEMA:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    @contextmanager
+    def transaction(self):
+        connection = self.connection()
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield connection
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+
+    def key(self, key, version=None) -> str:
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    @staticmethod
+    def alive(expires, now) -> bool:
+        return expires is None or expires > now
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        data, size = encode(value)
+        now = time.time()
+        with self.transaction() as connection:
+            row = connection.execute('SELECT expires FROM cache WHERE key = ?',
+                                     (key,)).fetchone()
+            if row is not None and self.alive(row[0], now):
+                return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+                (key, data, self.get_backend_timeout(timeout), now, size))
+        self.maybe_cull()
+        return True
+
+    def get(self, key, default=None, version=None):
+        key = self.key(key, version)
+        connection = self.connection()
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache WHERE key = ?',
+            (key,)).fetchone()
+        if row is None:
+            return default
+        value, expires, accessed = row
+        now = time.time()
+        if not self.alive(expires, now):
+            connection.execute(
+                'DELETE FROM cache WHERE key = ? AND expires = ?',
+                (key, expires))
+            return default
+        if now - accessed > TOUCH_INTERVAL:
+            connection.execute('UPDATE cache SET accessed = ? WHERE key = ?',
+                               (now, key))
+        return decode(value)
+
+    def get_many(self, keys, version=None):
+        names = {self.key(key, version): key for key in keys}
+        connection = self.connection()
+        now = time.time()
+        found = {}
+        stale = []
+        names_list = list(names)
+        for start in range(0, len(names_list), CHUNK):
+            chunk = names_list[start:start + CHUNK]
+            rows = connection.execute(
+                'SELECT key, value, expires, accessed FROM cache '
+                f'WHERE key IN ({", ".join("?" * len(chunk))})', chunk)
+            for name, value, expires, accessed in rows:
+                if not self.alive(expires, now):
+                    continue
+                if now - accessed > TOUCH_INTERVAL:
+                    stale.append(name)
+                found[names[name]] = decode(value)
+        if stale:
+            connection.executemany(
+                'UPDATE cache SET accessed = ? WHERE key = ?',
+                [(now, name) for name in stale])
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        data, size = encode(value)
+        self.connection().execute(
+            'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)',
+            (key, data, self.get_backend_timeout(timeout), time.time(), size))
+        self.maybe_cull()
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        now = time.time()
+        rows = []
+        for key, value in data.items():
+            encoded, size = encode(value)
+            rows.append((self.key(key, version), encoded, expires, now, size))
+        with self.transaction() as connection:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?, ?)', rows)
+        self.maybe_cull(len(rows))
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.key(key, version)
+        cursor = self.connection().execute(
+            'UPDATE cache SET expires = ? WHERE key = ? '
+            'AND (expires IS NULL OR expires > ?)',
+            (self.get_backend_timeout(timeout), key, time.time()))
+        return cursor.rowcount > 0
+
+    def incr(self, key, delta=1, version=None):
+        key = self.key(key, version)
+        with self.transaction() as connection:
+            row = connection.execute(
+                'SELECT value, expires FROM cache WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or not self.alive(row[1], time.time()):
+                raise ValueError(f"Key '{key}' not found")
+            value = decode(row[0]) + delta
+            data, size = encode(value)
+            connection.execute(
+                'UPDATE cache SET value = ?, size = ? WHERE key = ?',
+                (data, size, key))
+        return value
+
+    def has_key(self, key, version=None):
+        key = self.key(key, version)
+        row = self.connection().execute(
+            'SELECT expires FROM cache WHERE key = ?', (key,)).fetchone()
+        return row is not None and self.alive(row[0], time.time())
+
+    def delete(self, key, version=None):
+        key = self.key(key, version)
+        cursor = self.connection().execute('DELETE FROM cache WHERE key = ?',
+                                           (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        with self.transaction() as connection:
+            connection.executemany('DELETE FROM cache WHERE key = ?',
+                                   [(self.key(key, version),) for key in keys])
+
+    def clear(self):
+        self.connection().execute('DELETE FROM cache')
+
+    def maybe_cull(self, written=1) -> None:
+        with self._writes_lock:
+            self._writes += written
+            due = self._writes >= self.cull_every
+            if due:
+                self._writes = 0
+        if due:
+            self.cull()
+
+    def cull(self) -> None:
+        """Удаляет просроченные записи и вытесняет давно не читанные."""
+        with self.transaction() as connection:
+            connection.execute('DELETE FROM cache WHERE expires <= ?',
+                               (time.time(),))
+            count, size = connection.execute(
+                'SELECT count(*), coalesce(sum(size), 0) FROM cache'
+            ).fetchone()
+            batch = max(count // (self._cull_frequency or 1), 1)
+            while count and (count > self._max_entries
+                             or (self.max_size and size > self.max_size)):
+                connection.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY accessed LIMIT ?)', (batch,))
+                count, size = connection.execute(
+                    'SELECT count(*), coalesce(sum(size), 0) FROM cache'
+                ).fetchone()
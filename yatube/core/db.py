@@ -0,0 +1,100 @@
+"""
+Постоянные соединения с базой и присмотр за ними.
+
+Время жизни соединения задаёт стандартный CONN_MAX_AGE алиаса.
+Дополнительно в настройках алиаса можно указать:
+
+* CONN_HEALTH_CHECKS — соединение, пережившее HTTP-запрос, проверяется
+  is_usable() перед первым курсором следующего запроса и при обрыве
+  закрывается, чтобы открылось новое. Запросы, которые не ходят в базу,
+  проверку не выполняют;
+* CONN_POOL_SIZE — сколько соединений с алиасом может держать
+  один процесс (по соединению на поток); лишний поток ждёт
+  CONN_POOL_TIMEOUT секунд и получает OperationalError.
+
+Всё это делает ConnectionMixin, подмешанный в бэкенды
+core.backends.sqlite3 и core.backends.postgresql (ENGINE алиаса).
+Открытия, переиспользования и отбракованные соединения видны
+в /metrics.
+"""
+import threading
+
+from django.db import OperationalError
+
+from core import metrics
+
+OPENED = metrics.Counter('yatube_db_connections_opened_total',
+                         'Открытые соединения с базой.', ('alias',))
+REUSED = metrics.Counter('yatube_db_connections_reused_total',
+                         'HTTP-запросы, получившие готовое соединение.',
+                         ('alias',))
+UNHEALTHY = metrics.Counter('yatube_db_connections_unhealthy_total',
+                            'Соединения, не прошедшие проверку.', ('alias',))
+OPEN = metrics.Gauge('yatube_db_connections_open',
+                     'Открытые сейчас соединения.', ('alias',))
+
+_limits = {}
+_limits_lock = threading.Lock()
+
+
+def _limit(alias: str, size: int) -> threading.BoundedSemaphore:
+    with _limits_lock:
+        if alias not in _limits:
+            _limits[alias] = threading.BoundedSemaphore(size)
+        return _limits[alias]
+
+
+class ConnectionMixin:
+    """Пул, проверка и учёт соединений для DatabaseWrapper бэкенда."""
+
+    _pool_slot = None
+    _reused = False
+
+    def connect(self):
+        size = self.settings_dict.get('CONN_POOL_SIZE')
+        slot = None
+        if size:
+            slot = _limit(self.alias, size)
+            timeout = self.settings_dict.get('CONN_POOL_TIMEOUT', 5)
+            if not slot.acquire(timeout=timeout):
+                raise OperationalError(
+                    f'Connection pool for {self.alias!r} is exhausted')
+        try:
+            super().connect()
+        except Exception:
+            if slot is not None:
+                slot.release()
+            raise
+        self._pool_slot = slot
+        self._reused = False
+        OPENED.inc(alias=self.alias)
+        OPEN.inc(alias=self.alias)
+
+    def close(self):
+        was_open = self.connection is not None
+        try:
+            super().close()
+        finally:
+            if was_open and self.connection is None:
+                OPEN.dec(alias=self.alias)
+                if self._pool_slot is not None:
+                    self._pool_slot.release()
+                    self._pool_slot = None
+
+    def close_if_unusable_or_obsolete(self):
+        # Вызывается в начале и в конце каждого HTTP-запроса
+        # (close_old_connections): уцелевшее соединение проверяется
+        # при первом курсоре следующего запроса.
+        super().close_if_unusable_or_obsolete()
+        self._reused = self.connection is not None
+
+    def _cursor(self, name=None):
+        if self._reused:
+            self._reused = False
+            if (self.settings_dict.get('CONN_HEALTH_CHECKS')
+                    and not self.in_atomic_block and not self.is_usable()):
+                UNHEALTHY.inc(alias=self.alias)
+                self.close()
+            else:
+                REUSED.inc(alias=self.alias)
+        return super()._cursor(name)
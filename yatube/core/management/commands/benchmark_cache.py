@@ -0,0 +1,39 @@
+import shutil
+import tempfile
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+
+from core.cache import SQLiteCache
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает SQLiteCache с LocMemCache и FileBasedCache '
+            'на операциях set, get и incr.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--operations', type=int, default=2000)
+        parser.add_argument('--size', type=int, default=4096,
+                            help='Размер значения в байтах.')
+
+    def handle(self, *args, **options):
+        directory = tempfile.mkdtemp()
+        params = {'OPTIONS': {'MAX_ENTRIES': options['operations'] * 2}}
+        backends = {
+            'locmem': LocMemCache('benchmark', params),
+            'filebased': FileBasedCache(f'{directory}/files', params),
+            'sqlite': SQLiteCache(f'{directory}/cache.sqlite3', params),
+        }
+        try:
+            self.stdout.write(f'{"backend":<10} {"set/s":>10} {"get/s":>10} '
+                              f'{"incr/s":>10}')
+            for name, backend in backends.items():
+                result = benchmarks.cache_throughput(
+                    backend, options['operations'], options['size'])
+                self.stdout.write(
+                    f'{name:<10} {result["set"]:10.0f} {result["get"]:10.0f} '
+                    f'{result["incr"]:10.0f}')
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
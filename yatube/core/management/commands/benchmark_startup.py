@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import startup
+
+
+class Command(BaseCommand):
+    help = ('Замеряет холодный старт: django.setup(), URLconf, первый '
+            'запрос к каждому приложению и время импорта по пакетам.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Адрес первого запроса (можно повторять).')
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument('--top', type=int, default=15)
+        parser.add_argument('--max-setup', type=float,
+                            help='Порог django.setup() в секундах.')
+
+    def handle(self, *args, **options):
+        try:
+            result = startup.measure(options['urls'] or startup.DEFAULT_URLS,
+                                     max(options['runs'], 1))
+        except RuntimeError as error:
+            raise CommandError(f'Старт не удался: {error}')
+        self.stdout.write(startup.format_report(result, options['top']))
+        limit = options['max_setup']
+        if limit is not None and result.setup > limit:
+            raise CommandError(
+                f'django.setup() занял {result.setup:.3f} с, '
+                f'порог {limit:.3f} с')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from core import warmup
+from posts import benchmarks, seeding
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает загрузку шаблонов и время ответа страниц лент '
+            'без кеша шаблонов и с cached.Loader и замеряет отрисовку '
+            'карточки поста.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=10)
+        parser.add_argument('--seed', action='store_true',
+                            help='Сначала наполнить базу тестовыми данными.')
+
+    def handle(self, *args, **options):
+        runs = options['runs']
+        if options['seed']:
+            seeding.seed()
+        self.stdout.write(f'{"шаблон":<40} {"без кеша мс":>12} '
+                          f'{"с кешем мс":>12}')
+        for name, plain, cached in warmup.load_times(runs):
+            self.stdout.write(f'{name:<40} {plain * 1000:12.3f} '
+                              f'{cached * 1000:12.3f}')
+        self.stdout.write('')
+        self.stdout.write(f'{"страница":<40} {"без кеша мс":>12} '
+                          f'{"с кешем мс":>12}')
+        for view, plain, cached in benchmarks.template_pages(runs):
+            self.stdout.write(f'{view:<40} {plain * 1000:12.1f} '
+                              f'{cached * 1000:12.1f}')
+        self.stdout.write('')
+        self.stdout.write(f'{"карточка поста":<40} {"мкс":>12}')
+        for name, seconds in benchmarks.card_render().items():
+            self.stdout.write(f'{name:<40} {seconds * 1e6:12.1f}')
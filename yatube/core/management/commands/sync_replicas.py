@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import replication, routers
+
+
+class Command(BaseCommand):
+    help = 'Копирует основную базу SQLite в файлы реплик.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять каждые N секунд.')
+
+    def handle(self, *args, **options):
+        aliases = routers.replicas()
+        if not aliases:
+            self.stdout.write('Реплики не настроены (DATABASE_REPLICAS).')
+            return
+        while True:
+            for alias in aliases:
+                replication.sync(alias)
+            self.stdout.write(f'Реплики обновлены: {", ".join(aliases)}.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import warmup
+
+
+class Command(BaseCommand):
+    help = 'Компилирует все шаблоны из templates/ и сообщает об ошибках.'
+
+    def handle(self, *args, **options):
+        timings, errors = warmup.warm()
+        for name, error in errors.items():
+            self.stderr.write(f'{name}: {error}')
+        if errors:
+            raise CommandError(f'Шаблонов с ошибками: {len(errors)}.')
+        self.stdout.write(self.style.SUCCESS(
+            f'Скомпилировано шаблонов: {len(timings)} за '
+            f'{sum(timings.values()) * 1000:.1f} мс.'))
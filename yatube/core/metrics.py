@@ -0,0 +1,349 @@
+"""
+Метрики приложения в текстовом формате Prometheus.
+
+Счётчики и гистограммы объявляются на уровне модулей и пишутся
+в реестр процесса под общей блокировкой. Если задан METRICS_DIR,
+каждый процесс не чаще раза в METRICS_FLUSH_INTERVAL секунд сохраняет
+снимок своего реестра в файл <pid>.json этого каталога, а /metrics
+складывает снимки всех процессов, поэтому за несколькими воркерами
+gunicorn видны общие значения.
+
+Снимок завершившегося процесса (при выходе — им самим, а упавшего или
+убитого — первым же /metrics) «уходит на пенсию»: его счётчики
+и гистограммы прибавляются к общему снимку retired.json, который
+складывается со снимками живых процессов, а датчики отбрасываются.
+Поэтому суммы счётчиков не убывают, когда воркер перезапускается,
+и rate()/increase() в Prometheus не видят ложного сброса. Процесс,
+получивший реестр через fork, начинает свои серии с нуля и не
+повторяет значения родителя.
+"""
+import atexit
+import bisect
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+RETIRED = 'retired.json'
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0)
+
+
+class Registry:
+    """Значения метрик процесса."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+        self.values = {}
+        self.flushed = 0.0
+        self.pid = os.getpid()
+        self.exit_hook = False
+
+    def _check_pid(self) -> None:
+        # Вызывается под self.lock: после fork значения родителя
+        # остаются в его снимке, а у потомка начинается новая серия.
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.values.clear()
+            self.flushed = 0.0
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def add(self, name: str, labels: tuple, value: float, bucket=None):
+        """Прибавляет value к счётчику или наблюдение к гистограмме."""
+        with self.lock:
+            self._check_pid()
+            if bucket is None:
+                key = (name, labels)
+                self.values[key] = self.values.get(key, 0) + value
+                return
+            metric = self.metrics[name]
+            key = (name, labels)
+            state = self.values.get(key)
+            if state is None:
+                # Корзины, переполнение, сумма и число наблюдений.
+                state = self.values[key] = [0] * (len(metric.buckets) + 3)
+            state[bucket] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def snapshot(self) -> list:
+        with self.lock:
+            self._check_pid()
+            return [[name, list(labels),
+                     list(value) if isinstance(value, list) else value]
+                    for (name, labels), value in self.values.items()]
+
+    def reset(self) -> None:
+        with self.lock:
+            self.values.clear()
+
+    def directory(self):
+        return getattr(settings, 'METRICS_DIR', None)
+
+    def flush(self, force=False) -> None:
+        """Сохраняет снимок процесса для соседних воркеров."""
+        directory = self.directory()
+        if not directory:
+            return
+        now = time.monotonic()
+        interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1.0)
+        if not force and now - self.flushed < interval:
+            return
+        self.flushed = now
+        os.makedirs(directory, exist_ok=True)
+        _write(os.path.join(directory, f'{os.getpid()}.json'),
+               self.snapshot())
+        if not self.exit_hook:
+            self.exit_hook = True
+            atexit.register(self.retire_snapshot)
+
+    def retire_snapshot(self) -> None:
+        """Отправляет на пенсию снимок процесса перед его выходом."""
+        directory = self.directory()
+        if directory and os.path.isdir(directory):
+            self.flush(force=True)
+            self._retire(directory, f'{os.getpid()}.json')
+
+    def _retire(self, directory: str, name: str) -> None:
+        """Прибавляет счётчики и гистограммы снимка name к retired.json."""
+        claimed = os.path.join(directory, f'{name}.{uuid.uuid4().hex}.old')
+        try:
+            # Снимок забирает только один процесс, даже если /metrics
+            # обнаружили его несколько воркеров одновременно.
+            os.rename(os.path.join(directory, name), claimed)
+        except FileNotFoundError:
+            return
+        snapshot = [row for row in _read(claimed)
+                    if getattr(self.metrics.get(row[0]), 'kind',
+                               None) != 'gauge']
+        with _locked(directory):
+            path = os.path.join(directory, RETIRED)
+            _write(path, _rows(_merge([_read(path), snapshot])))
+        _remove(claimed)
+
+    def snapshots(self) -> list:
+        """Снимок процесса, снимки живых соседей и retired.json."""
+        snapshots = [self.snapshot()]
+        directory = self.directory()
+        if not directory or not os.path.isdir(directory):
+            return snapshots
+        own = f'{os.getpid()}.json'
+        names = [name for name in os.listdir(directory)
+                 if name.endswith('.json') and name != own]
+        for name in names:
+            if name != RETIRED and not _alive(name[:-len('.json')]):
+                self._retire(directory, name)
+        for name in os.listdir(directory):
+            if name.endswith('.json') and name != own:
+                snapshots.append(_read(os.path.join(directory, name)))
+        return snapshots
+
+    def collect(self) -> dict:
+        """Значения, сложенные по всем процессам."""
+        return {key: value
+                for key, value in _merge(self.snapshots()).items()
+                if key[0] in self.metrics}
+
+    def render(self) -> str:
+        values = self.collect()
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render(values))
+        return '\n'.join(lines) + '\n'
+
+
+def _alive(pid: str) -> bool:
+    try:
+        os.kill(int(pid), 0)
+    except ValueError:
+        return False
+    except PermissionError:
+        return True
+    except OSError:
+        return False
+    return True
+
+
+def _merge(snapshots) -> dict:
+    merged = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot:
+            key = (name, tuple(labels))
+            if isinstance(value, list):
+                total = merged.setdefault(key, [0] * len(value))
+                merged[key] = [a + b for a, b in zip(total, value)]
+            else:
+                merged[key] = merged.get(key, 0) + value
+    return merged
+
+
+def _rows(values: dict) -> list:
+    return [[name, list(labels), value]
+            for (name, labels), value in values.items()]
+
+
+def _read(path: str) -> list:
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return []
+
+
+def _write(path: str, snapshot: list) -> None:
+    handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path),
+                                         suffix='.tmp')
+    with os.fdopen(handle, 'w') as file:
+        json.dump(snapshot, file)
+    os.replace(temporary, path)
+
+
+@contextmanager
+def _locked(directory: str):
+    """Блокировка retired.json между процессами."""
+    with open(os.path.join(directory, '.lock'), 'w') as file:
+        fcntl.flock(file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(file, fcntl.LOCK_UN)
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+registry = Registry()
+
+
+def _escape(value) -> str:
+    return (str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"'
+                          for name, value in pairs) + '}'
+
+
+def _number(value) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        registry.register(self)
+
+    def key(self, labels: dict) -> tuple:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> list:
+        return [f'# HELP {self.name} {self.documentation}',
+                f'# TYPE {self.name} {self.kind}']
+
+    def series(self, values) -> list:
+        return sorted((labels, value) for (name, labels), value
+                      in values.items() if name == self.name)
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels) -> None:
+        registry.add(self.name, self.key(labels), amount)
+
+    def render(self, values) -> list:
+        return self.header() + [
+            f'{self.name}{_labels(self.labelnames, labels)} {_number(value)}'
+            for labels, value in self.series(values)]
+
+
+class Gauge(Counter):
+    """Текущее значение; у нескольких процессов значения складываются."""
+
+    kind = 'gauge'
+
+    def dec(self, amount=1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def observe(self, value: float, **labels) -> None:
+        # Значение больше всех границ попадает в корзину переполнения.
+        bucket = bisect.bisect_left(self.buckets, value)
+        registry.add(self.name, self.key(labels), value, bucket=bucket)
+
+    def render(self, values) -> list:
+        lines = self.header()
+        for labels, state in self.series(values):
+            cumulative = 0
+            bounds = [*self.buckets, '+Inf']
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                le = _labels(self.labelnames, labels, [('le', bound)])
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            plain = _labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{plain} {_number(state[-2])}')
+            lines.append(f'{self.name}_count{plain} {state[-1]}')
+        return lines
+
+
+class Ratio(Metric):
+    """Доля значения label=hit у счётчика, вычисляемая при выдаче."""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, counter: Counter, label: str,
+                 hit: str):
+        self.counter = counter
+        self.label = label
+        self.hit = hit
+        super().__init__(name, documentation)
+
+    def render(self, values) -> list:
+        index = self.counter.labelnames.index(self.label)
+        total = hits = 0
+        for labels, value in self.counter.series(values):
+            total += value
+            if labels[index] == self.hit:
+                hits += value
+        return self.header() + [
+            f'{self.name} {_number(hits / total if total else 0.0)}']
+
+
+REQUESTS = Counter('yatube_requests_total',
+                   'Обработанные запросы по имени URL.',
+                   ('view', 'method', 'status'))
+REQUEST_LATENCY = Histogram('yatube_request_duration_seconds',
+                            'Время ответа по имени URL.', ('view',))
+REQUEST_QUERIES = Histogram('yatube_request_db_queries',
+                            'Число SQL-запросов на один запрос.', ('view',),
+                            buckets=(1, 2, 5, 10, 20, 50, 100, 200))
@@ -0,0 +1,76 @@
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from core import metrics, profiling
+
+logger = logging.getLogger('yatube.profiling')
+
+
+class ProfilingMiddleware:
+    """
+    Профилирует долю запросов PROFILING_SAMPLE_RATE.
+
+    Для выбранных запросов добавляет заголовок Server-Timing и пишет
+    в лог yatube.profiling строку JSON с временем ответа, числом и
+    временем SQL-запросов, временем шаблонов и попаданиями в кеш.
+    Обёртки ставятся только на время выбранного запроса:
+    с PROFILING_SAMPLE_RATE = 0 методы Django остаются нетронутыми.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def sampled(self) -> bool:
+        rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.sampled():
+            return self.get_response(request)
+        with profiling.profile_request() as profile:
+            response = self.get_response(request)
+        response['Server-Timing'] = profile.server_timing()
+        match = getattr(request, 'resolver_match', None)
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            **profile.as_dict(),
+        }))
+        return response
+
+
+class MetricsMiddleware:
+    """Считает запросы, время ответа и число SQL-запросов по имени URL."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        queries = [0]
+
+        def count(execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(count))
+            response = self.get_response(request)
+        elapsed = time.perf_counter() - start
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else 'unresolved'
+        metrics.REQUESTS.inc(view=view, method=request.method,
+                             status=response.status_code)
+        metrics.REQUEST_LATENCY.observe(elapsed, view=view)
+        metrics.REQUEST_QUERIES.observe(queries[0], view=view)
+        metrics.registry.flush()
+        return response
@@ -0,0 +1,221 @@
+import base64
+import binascii
+import json
+from collections.abc import Sequence
+from operator import attrgetter
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
+
+
+class LazyRows(Sequence):
+    """Записи страницы, которые читаются из базы при первом обращении."""
+
+    def __init__(self, load):
+        self._load = load
+        self._rows = None
+
+    @property
+    def rows(self) -> list:
+        if self._rows is None:
+            self._rows = list(self._load())
+        return self._rows
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, index):
+        return self.rows[index]
+
+
+class CursorPaginator(Paginator):
+    """
+    Постраничный вывод по ключу (pub_date, id).
+
+    Следующая страница выбирается условием по ключу последней записи
+    текущей страницы, поэтому глубокие страницы стоят столько же,
+    сколько первая, а COUNT(*) по всей ленте не выполняется.
+    Курсоры непрозрачны для клиента: это base64 от JSON со значениями
+    ключа и направлением обхода.
+
+    Возвращаемая страница — обычный Page с атрибутами cursor,
+    next_cursor и previous_cursor. Число страниц известно только
+    в пределах соседних страниц, поэтому number и num_pages условны:
+    их хватает для has_next()/has_previous(), но не для списка страниц.
+    """
+
+    def __init__(self, object_list: QuerySet, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list.order_by(*ordering), per_page)
+        self.ordering = ordering
+        self.fields = [name.lstrip('-') for name in ordering]
+        self._num_pages = 1
+
+    @property
+    def num_pages(self):
+        return self._num_pages
+
+    def get_page(self, cursor=None, number=None):
+        """
+        Возвращает страницу по курсору.
+
+        Без курсора поддерживается старый параметр ?page=N: такие ссылки
+        продолжают работать, но обходятся смещением, как и раньше.
+        """
+        key = self.decode_cursor(cursor)
+        if key is not None:
+            values, backwards = key
+            return self._keyset_page(values, backwards, cursor)
+        try:
+            number = max(int(number), 1)
+        except (TypeError, ValueError):
+            number = 1
+        return self._offset_page(number)
+
+    def get_lazy_page(self, cursor=None, number=None) -> Page:
+        """
+        Страница как у get_page, но записи читаются при первом обращении.
+
+        Номер страницы и курсоры навигации становятся известны после
+        этого обращения, поэтому шаблоны выводят навигацию после записей.
+        Если записи так и не понадобились (фрагмент взят из кеша), запросов
+        к базе не будет.
+        """
+        page = self._get_page(
+            LazyRows(lambda: self._load_into(page, cursor, number)), 1, self)
+        page.cursor = cursor
+        page.next_cursor = page.previous_cursor = None
+        return page
+
+    def _load_into(self, page, cursor, number) -> list:
+        loaded = self.get_page(cursor, number)
+        page.number = loaded.number
+        page.cursor = loaded.cursor
+        page.next_cursor = loaded.next_cursor
+        page.previous_cursor = loaded.previous_cursor
+        return loaded.object_list
+
+    def encode_cursor(self, obj, backwards=False) -> str:
+        values = [str(getattr(obj, name)) for name in self.fields]
+        raw = json.dumps([values, int(backwards)], separators=(',', ':'))
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Разбирает курсор; испорченный курсор означает первую страницу."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values, backwards = json.loads(base64.urlsafe_b64decode(padded))
+            # encode_cursor пишет значения ключа строками; null и другие
+            # типы дали бы в _after() условие, которое не построить.
+            if (not isinstance(values, list)
+                    or len(values) != len(self.fields)
+                    or not all(isinstance(value, str) for value in values)
+                    or backwards not in (0, 1)):
+                return None
+            values = [
+                self._field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except (binascii.Error, ValueError, TypeError, ValidationError):
+            return None
+        if any(value is None for value in values):
+            return None
+        return values, bool(backwards)
+
+    def _field(self, name):
+        """Поле ключа: столбец модели или аннотация выборки."""
+        annotations = self.object_list.query.annotations
+        if name in annotations:
+            return annotations[name].output_field
+        return self.object_list.model._meta.get_field(name)
+
+    def _after(self, values, backwards=False) -> Q:
+        """Условие «строго после ключа» в порядке сортировки ленты."""
+        condition = Q()
+        for i, name in enumerate(self.fields):
+            descending = self.ordering[i].startswith('-')
+            lookup = 'gt' if descending == backwards else 'lt'
+            step = Q(**{f'{name}__{lookup}': values[i]})
+            for prev_name, prev_value in zip(self.fields[:i], values[:i]):
+                step &= Q(**{prev_name: prev_value})
+            condition |= step
+        return condition
+
+    def _reversed_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def _fetch(self, condition, ordering, bottom, limit) -> list:
+        queryset = self.object_list.filter(condition).order_by(*ordering)
+        return list(queryset[bottom:bottom + limit])
+
+    def _keyset_page(self, values, backwards, cursor):
+        ordering = self._reversed_ordering() if backwards else self.ordering
+        rows = self._fetch(self._after(values, backwards), ordering,
+                           0, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        if not rows:
+            return self._offset_page(1)
+        if backwards:
+            return self._make_page(rows, has_previous=has_more,
+                                   has_next=True, cursor=cursor)
+        return self._make_page(rows, has_previous=True, has_next=has_more,
+                               cursor=cursor)
+
+    def _offset_page(self, number):
+        bottom = (number - 1) * self.per_page
+        rows = self._fetch(Q(), self.ordering, bottom, self.per_page + 1)
+        if not rows and number > 1:
+            return self._offset_page(1)
+        return self._make_page(rows[:self.per_page], has_previous=number > 1,
+                               has_next=len(rows) > self.per_page,
+                               number=number)
+
+    def _make_page(self, rows, has_previous, has_next, number=None,
+                   cursor=None) -> Page:
+        if number is None:
+            number = 2 if has_previous else 1
+        self._num_pages = number + 1 if has_next else number
+        page = self._get_page(rows, number, self)
+        page.cursor = cursor
+        page.next_cursor = (
+            self.encode_cursor(rows[-1]) if has_next and rows else None)
+        page.previous_cursor = (
+            self.encode_cursor(rows[0], backwards=True)
+            if has_previous and rows else None)
+        return page
+
+
+class MergedCursorPaginator(CursorPaginator):
+    """
+    Постраничный вывод по ключу для объединения нескольких выборок.
+
+    Каждая выборка читается своим запросом с тем же условием по ключу
+    и тем же лимитом, результаты сливаются в памяти. Один объект может
+    попасть в несколько выборок, дубликаты отбрасываются.
+    """
+
+    def __init__(self, querysets, per_page, ordering=('-pub_date', '-id')):
+        super().__init__(querysets[0], per_page, ordering)
+        self.querysets = [
+            queryset.order_by(*ordering) for queryset in querysets]
+
+    def _fetch(self, condition, ordering, bottom, limit) -> list:
+        rows = {}
+        for queryset in self.querysets:
+            queryset = queryset.filter(condition).order_by(*ordering)
+            for obj in queryset[:bottom + limit]:
+                rows[obj.pk] = obj
+        rows = list(rows.values())
+        for name in reversed(ordering):
+            rows.sort(key=attrgetter(name.lstrip('-')),
+                      reverse=name.startswith('-'))
+        return rows[bottom:bottom + limit]
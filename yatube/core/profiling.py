@@ -0,0 +1,187 @@
+"""
+Лёгкое профилирование запросов.
+
+Для выбранного запроса заводится Profile в локальной памяти потока,
+и на время запроса ставятся обёртки, которые пишут в него замеры.
+SQL считает connection.execute_wrapper, а чтение кеша — обёртки
+get и get_many на экземплярах кешей: и соединения, и caches[alias]
+у каждого потока свои, так что соседние запросы их не видят.
+Template.render общий для всех потоков, поэтому он обёрнут, только
+пока идёт хоть один профилируемый запрос, а его обёртка сразу
+вызывает исходный метод, если в потоке нет профиля. После запроса
+всё возвращается как было; без выборки ничего не оборачивается.
+"""
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.template.base import Template
+
+_local = threading.local()
+_missing = object()
+_render = None
+_rendering = 0
+_render_lock = threading.Lock()
+
+
+@dataclass
+class Profile:
+    """Замеры одного запроса; время в секундах."""
+
+    started: float = field(default_factory=time.perf_counter)
+    total: float = 0.0
+    sql_count: int = 0
+    sql_time: float = 0.0
+    template_time: float = 0.0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    depth: dict = field(default_factory=dict)
+
+    def finish(self) -> None:
+        self.total = time.perf_counter() - self.started
+
+    def as_dict(self) -> dict:
+        return {
+            'total_ms': round(self.total * 1000, 2),
+            'sql_count': self.sql_count,
+            'sql_ms': round(self.sql_time * 1000, 2),
+            'template_ms': round(self.template_time * 1000, 2),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+        }
+
+    def server_timing(self) -> str:
+        """Значение заголовка Server-Timing."""
+        return ', '.join((
+            f'total;dur={self.total * 1000:.1f}',
+            f'sql;dur={self.sql_time * 1000:.1f};'
+            f'desc="{self.sql_count} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{self.cache_hits} hits, '
+            f'{self.cache_misses} misses"',
+        ))
+
+
+def current():
+    """Активный профиль текущего потока или None."""
+    return getattr(_local, 'profile', None)
+
+
+@contextmanager
+def outermost(profile: Profile, kind: str):
+    """Отличает внешний вызов от вложенных (include, get_many → get)."""
+    profile.depth[kind] = profile.depth.get(kind, 0) + 1
+    try:
+        yield profile.depth[kind] == 1
+    finally:
+        profile.depth[kind] -= 1
+
+
+def _sql_wrapper(execute, sql, params, many, context):
+    profile = current()
+    if profile is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        profile.sql_count += 1
+        profile.sql_time += time.perf_counter() - start
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, context):
+        profile = current()
+        if profile is None:
+            return render(self, context)
+        with outermost(profile, 'template') as top:
+            start = time.perf_counter()
+            try:
+                return render(self, context)
+            finally:
+                if top:
+                    profile.template_time += time.perf_counter() - start
+    return wrapper
+
+
+def _counted_get(get, profile: Profile):
+    @wraps(get)
+    def wrapper(key, default=None, version=None):
+        with outermost(profile, 'cache') as top:
+            value = get(key, _missing, version)
+        if top:
+            if value is _missing:
+                profile.cache_misses += 1
+            else:
+                profile.cache_hits += 1
+        return default if value is _missing else value
+    return wrapper
+
+
+def _counted_get_many(get_many, profile: Profile):
+    @wraps(get_many)
+    def wrapper(keys, version=None):
+        keys = list(keys)
+        with outermost(profile, 'cache') as top:
+            found = get_many(keys, version)
+        if top:
+            profile.cache_hits += len(found)
+            profile.cache_misses += len(keys) - len(found)
+        return found
+    return wrapper
+
+
+@contextmanager
+def _timed_templates():
+    """Оборачивает Template.render, пока идёт хоть один профиль."""
+    global _render, _rendering
+    with _render_lock:
+        if not _rendering:
+            _render = Template.render
+            Template.render = _timed_render(_render)
+        _rendering += 1
+    try:
+        yield
+    finally:
+        with _render_lock:
+            _rendering -= 1
+            if not _rendering:
+                Template.render = _render
+                _render = None
+
+
+@contextmanager
+def _counted_caches(profile: Profile):
+    """Оборачивает get и get_many у кешей текущего потока."""
+    backends = [caches[alias] for alias in settings.CACHES]
+    for backend in backends:
+        backend.get = _counted_get(backend.get, profile)
+        backend.get_many = _counted_get_many(backend.get_many, profile)
+    try:
+        yield
+    finally:
+        for backend in backends:
+            del backend.get, backend.get_many
+
+
+@contextmanager
+def profile_request():
+    """Активирует профиль на время обработки запроса."""
+    profile = Profile()
+    _local.profile = profile
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(_sql_wrapper))
+            stack.enter_context(_timed_templates())
+            stack.enter_context(_counted_caches(profile))
+            yield profile
+    finally:
+        profile.finish()
+        _local.profile = None
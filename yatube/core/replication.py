@@ -0,0 +1,21 @@
+"""
+Замена настоящей репликации для локального запуска.
+
+Реплика SQLite — отдельный файл, который целиком перезаписывается
+копией default через online backup API. Команда sync_replicas делает
+это один раз или с заданным интервалом.
+"""
+from django.db import connections
+
+from core.routers import PRIMARY
+
+
+def sync(replica: str, primary: str = PRIMARY) -> None:
+    """Копирует базу primary в реплику."""
+    source = connections[primary]
+    target = connections[replica]
+    if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+        raise ValueError('Only SQLite replicas can be synced locally')
+    source.ensure_connection()
+    target.ensure_connection()
+    source.connection.backup(target.connection)
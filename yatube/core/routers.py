@@ -0,0 +1,98 @@
+"""
+Чтение лент с реплик.
+
+ReplicaMiddleware помечает запросы GET к представлениям из REPLICA_VIEWS,
+и на время такого запроса ReplicaRouter отправляет чтение на одну из
+реплик DATABASE_REPLICAS. Запись всегда идёт в default. После записи
+ответ получает cookie, и следующие REPLICA_PIN_SECONDS секунд этот
+браузер читает с default, чтобы видеть свои изменения, пока реплики
+догоняют.
+"""
+import random
+import threading
+import time
+
+from django.conf import settings
+
+PIN_COOKIE = 'primary_until'
+PRIMARY = 'default'
+
+_local = threading.local()
+
+
+def replicas() -> list:
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+def pin_seconds() -> int:
+    return getattr(settings, 'REPLICA_PIN_SECONDS', 10)
+
+
+def used_replica() -> bool:
+    """Читал ли текущий запрос с реплики."""
+    return getattr(_local, 'used_replica', False)
+
+
+class ReplicaRouter:
+    # Сессии читаются при каждом запросе и должны быть свежими.
+    primary_apps = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        if (not getattr(_local, 'replica_allowed', False)
+                or getattr(_local, 'wrote', False)
+                or model._meta.app_label in self.primary_apps):
+            return None
+        aliases = replicas()
+        if not aliases:
+            return None
+        _local.used_replica = True
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        _local.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии default, объекты с разных алиасов совместимы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема попадает на реплики вместе с данными.
+        return db not in replicas()
+
+
+class ReplicaMiddleware:
+    """Разрешает чтение с реплик для представлений из REPLICA_VIEWS."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def pinned(self, request) -> bool:
+        try:
+            return float(request.COOKIES.get(PIN_COOKIE, 0)) > time.time()
+        except ValueError:
+            return False
+
+    def __call__(self, request):
+        _local.replica_allowed = False
+        _local.used_replica = False
+        _local.wrote = False
+        try:
+            response = self.get_response(request)
+            if _local.wrote and replicas():
+                window = pin_seconds()
+                response.set_cookie(PIN_COOKIE, str(time.time() + window),
+                                    max_age=window, httponly=True)
+            return response
+        finally:
+            _local.replica_allowed = False
+            _local.used_replica = False
+            _local.wrote = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        match = request.resolver_match
+        _local.replica_allowed = (
+            request.method in ('GET', 'HEAD')
+            and match is not None
+            and match.view_name in getattr(settings, 'REPLICA_VIEWS', ())
+            and not self.pinned(request))
@@ -0,0 +1,53 @@
+"""
+Настройка соединений SQLite под несколько воркеров.
+
+При открытии соединения выполняются прагмы из SQLITE_PRAGMAS: журнал
+WAL позволяет читать во время записи, synchronous=NORMAL убирает fsync
+на каждую фиксацию, busy_timeout заставляет писателя ждать блокировку,
+а не падать с «database is locked».
+
+Писатели сериализуются самой SQLite: транзакции начинаются с
+BEGIN IMMEDIATE и сразу берут блокировку записи. Отложенная транзакция,
+которая сначала читает и только потом пишет, не может дождаться
+блокировки и получает SQLITE_BUSY мимо busy_timeout.
+"""
+import re
+
+from django.conf import settings
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+NAME_RE = re.compile(r'^[a-z_]+$')
+VALUE_RE = re.compile(r'^-?\w+$')
+
+
+def pragmas() -> dict:
+    return getattr(settings, 'SQLITE_PRAGMAS', DEFAULT_PRAGMAS)
+
+
+def begin_immediate(connection) -> None:
+    connection.cursor().execute('BEGIN IMMEDIATE')
+
+
+def configure(connection) -> None:
+    """Применяет профиль прагм и режим транзакций к соединению."""
+    raw = connection.connection
+    for name, value in pragmas().items():
+        if not NAME_RE.match(name) or not VALUE_RE.match(str(value)):
+            raise ValueError(f'Bad SQLite pragma {name}={value!r}')
+        # Мимо курсоров Django: прагмы не попадают в счётчики запросов.
+        raw.execute(f'PRAGMA {name} = {value}')
+    if getattr(settings, 'SQLITE_IMMEDIATE_TRANSACTIONS', True):
+        connection._start_transaction_under_autocommit = (
+            lambda: begin_immediate(connection))
+
+
+def on_connection_created(sender, connection, **kwargs) -> None:
+    if connection.vendor == 'sqlite':
+        configure(connection)
@@ -0,0 +1,171 @@
+"""
+Замеры холодного старта воркера.
+
+Запуск измеряется в отдельном процессе ``python -X importtime``: уже
+настроенный Django в текущем процессе повторно не запустить. Процесс
+замеряет django.setup(), сборку URLconf и первый запрос к каждому
+адресу через WSGI-обработчик с пустым кешем и печатает результат
+строкой JSON, а отчёт интерпретатора об импортах раскладывается по
+пакетам. Запросы идут в текущую базу, как и у benchmark_views.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+# Один адрес на приложение: первый запрос грузит его представления
+# и шаблоны.
+DEFAULT_URLS = ('/', '/about/author/', '/auth/login/', '/metrics')
+
+PROBE = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+import django
+from django.conf import settings
+
+# Пустой кеш процесса: первый запрос рисует страницу, а не берёт её
+# из общего кеша, заполненного прошлым замером.
+settings.CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+}
+django.setup()
+setup = time.perf_counter() - start
+
+from django.urls import get_resolver, resolve
+
+start = time.perf_counter()
+resolver = get_resolver()
+resolver.url_patterns
+resolver.reverse_dict
+urlconf = time.perf_counter() - start
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.test import RequestFactory
+
+handler = WSGIHandler()
+factory = RequestFactory()
+requests = []
+for url in sys.argv[1:]:
+    status = []
+    start = time.perf_counter()
+    response = handler(factory.get(url).environ,
+                       lambda line, headers: status.append(line))
+    b''.join(response)
+    response.close()
+    match = resolve(url)
+    requests.append({
+        'url': url,
+        'app': match.namespace or match.app_name or match.view_name,
+        'status': int(status[0].split()[0]),
+        'seconds': time.perf_counter() - start,
+    })
+print(json.dumps({'setup': setup, 'urlconf': urlconf, 'requests': requests}))
+'''
+
+
+@dataclass
+class Startup:
+    setup: float
+    urlconf: float
+    requests: list
+    # Собственное время импорта модулей по пакетам верхнего уровня, с.
+    packages: dict = field(default_factory=dict)
+    # Самые долгие модули: пары (модуль, собственное время, с).
+    modules: list = field(default_factory=list)
+
+
+def parse_importtime(output: str) -> list:
+    """Строки отчёта -X importtime: (модуль, собственное, суммарное), мкс."""
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        try:
+            own, cumulative, name = line[len('import time:'):].split('|')
+            rows.append((name.strip(), int(own), int(cumulative)))
+        except ValueError:
+            # Заголовок «self [us] | cumulative | imported package».
+            continue
+    return rows
+
+
+def by_package(rows) -> dict:
+    """Собственное время импорта, сложенное по пакетам верхнего уровня."""
+    totals = defaultdict(int)
+    for name, own, _ in rows:
+        totals[name.split('.')[0]] += own
+    return {name: own / 1e6 for name, own in
+            sorted(totals.items(), key=lambda item: -item[1])}
+
+
+def probe(urls=DEFAULT_URLS) -> Startup:
+    """Один холодный старт в отдельном процессе."""
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+    env['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [settings.BASE_DIR, env.get('PYTHONPATH')]))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', PROBE, *urls],
+        cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE, universal_newlines=True, check=False)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    data = json.loads(result.stdout.strip().splitlines()[-1])
+    rows = parse_importtime(result.stderr)
+    modules = sorted(((name, own / 1e6) for name, own, _ in rows),
+                     key=lambda item: -item[1])
+    return Startup(data['setup'], data['urlconf'], data['requests'],
+                   by_package(rows), modules)
+
+
+def measure(urls=DEFAULT_URLS, runs=3) -> Startup:
+    """Медианы нескольких холодных стартов."""
+    probes = [probe(urls) for _ in range(runs)]
+    requests = []
+    for index, request in enumerate(probes[0].requests):
+        requests.append({**request, 'seconds': statistics.median(
+            item.requests[index]['seconds'] for item in probes)})
+    packages = defaultdict(list)
+    for item in probes:
+        for name, seconds in item.packages.items():
+            packages[name].append(seconds)
+    median = probes[sorted(range(runs),
+                           key=lambda index: probes[index].setup)[runs // 2]]
+    return Startup(
+        setup=statistics.median(item.setup for item in probes),
+        urlconf=statistics.median(item.urlconf for item in probes),
+        requests=requests,
+        packages=dict(sorted(
+            ((name, statistics.median(values))
+             for name, values in packages.items()),
+            key=lambda item: -item[1])),
+        modules=median.modules,
+    )
+
+
+def format_report(startup: Startup, top=15) -> str:
+    lines = [
+        f'{"django.setup()":<28} {startup.setup * 1000:8.1f} ms',
+        f'{"URLconf":<28} {startup.urlconf * 1000:8.1f} ms',
+        '',
+        f'{"первый запрос":<28} {"ms":>8}  статус',
+    ]
+    for request in startup.requests:
+        label = f'{request["app"]} {request["url"]}'
+        lines.append(f'{label:<28} {request["seconds"] * 1000:8.1f}  '
+                     f'{request["status"]}')
+    lines += ['', f'{"импорт по пакетам":<28} {"ms":>8}']
+    for name, seconds in list(startup.packages.items())[:top]:
+        lines.append(f'{name:<28} {seconds * 1000:8.1f}')
+    lines += ['', f'{"самые долгие модули":<48} {"ms":>8}']
+    for name, seconds in startup.modules[:top]:
+        lines.append(f'{name:<48} {seconds * 1000:8.1f}')
+    return '\n'.join(lines)
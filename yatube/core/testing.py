@@ -0,0 +1,44 @@
+"""
+Окружение тестов.
+
+Тесты работают с тем же кешем core.cache.SQLiteCache, что и сервер, но
+в своём временном файле: версии и фрагменты лент, оставшиеся от других
+запусков и от разработки, им не видны. Пул миниатюр выключен, задания
+выполняются сразу после фиксации транзакции, а не в фоне.
+
+``manage.py test`` подключает окружение через TEST_RUNNER, pytest —
+через conftest.py в корне репозитория.
+"""
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+
+@contextmanager
+def isolated():
+    directory = tempfile.mkdtemp(prefix='yatube-test-')
+    caches = {alias: {**options,
+                      'LOCATION': os.path.join(directory, f'{alias}.sqlite3')}
+              for alias, options in settings.CACHES.items()}
+    try:
+        with override_settings(CACHES=caches, THUMBNAIL_WORKERS=0):
+            yield
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TestRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._isolated = isolated()
+        self._isolated.__enter__()
+
+    def teardown_test_environment(self, **kwargs):
+        self._isolated.__exit__(None, None, None)
+        super().teardown_test_environment(**kwargs)
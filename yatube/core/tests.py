@@ -0,0 +1,565 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from importlib import util
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache, caches
+from django.db import OperationalError, connection, connections, transaction
+from django.template.base import Template
+from django.test import (SimpleTestCase, TestCase, TransactionTestCase,
+                         Client, override_settings)
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import (db, metrics, profiling, routers, sqlite, startup,
+                  warmup)
+from core.cache import SQLiteCache
+from core.tiered import TieredCache
+from posts import counters, feed_cache
+from posts.models import Post
+
+User = get_user_model()
+
+
+class ProfilingMiddlewareTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора и пост."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    @override_settings(PROFILING_SAMPLE_RATE=0.0)
+    def test_profiling_disabled(self):
+        """Без выборки нет Server-Timing, а методы Django не обёрнуты."""
+        with mock.patch.object(profiling, 'profile_request') as profile:
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotIn('Server-Timing', response)
+        profile.assert_not_called()
+
+    def test_wrappers_scoped_to_request(self):
+        """Обёртки видны только профилируемому запросу и снимаются после."""
+        render = Template.render
+        seen = {}
+
+        def neighbour():
+            seen['cache'] = 'get' in vars(caches['default'])
+
+        with profiling.profile_request():
+            self.assertIn('get', vars(caches['default']))
+            self.assertIsNot(Template.render, render)
+            thread = threading.Thread(target=neighbour)
+            thread.start()
+            thread.join()
+        self.assertFalse(seen['cache'])
+        self.assertNotIn('get', vars(caches['default']))
+        self.assertIs(Template.render, render)
+
+    @override_settings(PROFILING_SAMPLE_RATE=1.0)
+    def test_profiling_records_request(self):
+        """Выбранный запрос получает Server-Timing и строку в логе."""
+        with self.assertLogs('yatube.profiling', 'INFO') as logs:
+            response = self.client.get(reverse('posts:index'))
+        self.assertIn('sql;dur=', response['Server-Timing'])
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'posts:index')
+        self.assertEqual(record['status'], 200)
+        self.assertGreater(record['sql_count'], 0)
+        self.assertGreater(record['template_ms'], 0)
+        self.assertGreater(record['cache_misses'], 0)
+
+        with self.assertLogs('yatube.profiling', 'INFO') as logs:
+            self.client.get(reverse('posts:index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertGreater(record['cache_hits'], 0)
+
+
+@override_settings(PAGE_CACHE_TIMEOUT=0)
+class MetricsEndpointTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора и пост."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+        metrics.registry.reset()
+
+    def test_metrics_exposes_requests(self):
+        """/metrics отдаёт счётчики и гистограммы в формате Prometheus."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        text = response.content.decode()
+        self.assertIn('yatube_requests_total{view="posts:index",'
+                      'method="GET",status="200"} 2', text)
+        self.assertIn('yatube_request_duration_seconds_bucket{'
+                      'view="posts:index",le="+Inf"} 2', text)
+        self.assertIn('yatube_request_db_queries_count{'
+                      'view="posts:index"} 2', text)
+        self.assertIn('yatube_feed_cache_requests_total{result="hit"} 1',
+                      text)
+        self.assertIn('yatube_feed_cache_hit_ratio 0.5', text)
+
+    def test_metrics_merge_worker_snapshots(self):
+        """Метрики соседних процессов складываются со своими."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        with open(os.path.join(directory, f'{os.getppid()}.json'),
+                  'w') as file:
+            json.dump([['yatube_requests_total',
+                        ['posts:index', 'GET', '200'], 5]], file)
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('posts:index'))
+            self.assertTrue(os.path.exists(
+                os.path.join(directory, f'{os.getpid()}.json')))
+            text = self.client.get('/metrics').content.decode()
+        self.assertIn('yatube_requests_total{view="posts:index",'
+                      'method="GET",status="200"} 6', text)
+
+    def test_exited_worker_counters_retired(self):
+        """Счётчики завершившегося процесса не пропадают из суммы."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        process = subprocess.Popen([sys.executable, '-c', 'pass'])
+        process.wait()
+        stale = os.path.join(directory, f'{process.pid}.json')
+        with open(stale, 'w') as file:
+            json.dump([['yatube_requests_total',
+                        ['posts:index', 'GET', '200'], 5],
+                       ['yatube_db_connections_open', ['default'], 3]],
+                      file)
+        total = ('yatube_requests_total{view="posts:index",'
+                 'method="GET",status="200"} 6')
+        with override_settings(METRICS_DIR=directory):
+            self.client.get(reverse('posts:index'))
+            text = self.client.get('/metrics').content.decode()
+            self.assertFalse(os.path.exists(stale))
+            self.assertIn(total, text)
+            self.assertNotIn('yatube_db_connections_open{alias="default"} 3',
+                             text)
+            # Выход самого процесса: его снимок тоже уходит на пенсию.
+            metrics.registry.retire_snapshot()
+            metrics.registry.reset()
+            self.assertEqual(sorted(os.listdir(directory)),
+                             ['.lock', metrics.RETIRED])
+            text = self.client.get('/metrics').content.decode()
+        self.assertIn(total, text)
+
+    def test_forked_process_starts_new_series(self):
+        """После fork процесс не повторяет значения родителя."""
+        self.client.get(reverse('posts:index'))
+        with mock.patch.object(metrics.registry, 'pid', -1):
+            self.assertEqual(metrics.registry.snapshot(), [])
+
+    def test_metrics_restricted(self):
+        """Метрики закрыты для посторонних адресов, кроме сотрудников."""
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 403)
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get('/metrics', REMOTE_ADDR='203.0.113.7')
+        self.assertEqual(response.status_code, 200)
+
+
+class SQLiteTuningTest(TransactionTestCase):
+
+    def test_pragmas_applied(self):
+        """Соединение получает прагмы из SQLITE_PRAGMAS."""
+        with override_settings(SQLITE_PRAGMAS={'busy_timeout': 1234,
+                                               'synchronous': 'normal'}):
+            sqlite.configure(connection)
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+        sqlite.configure(connection)
+
+    def test_bad_pragma_rejected(self):
+        """Прагма с подозрительным значением не выполняется."""
+        with override_settings(SQLITE_PRAGMAS={'cache_size': '1; DROP'}):
+            with self.assertRaises(ValueError):
+                sqlite.configure(connection)
+
+    def test_transactions_begin_immediate(self):
+        """Транзакция сразу берёт блокировку записи."""
+        with CaptureQueriesContext(connection) as context:
+            with transaction.atomic():
+                User.objects.create_user(username='writer')
+        self.assertEqual(context.captured_queries[0]['sql'],
+                         'BEGIN IMMEDIATE')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTest(TransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='auth')
+        self.post = Post.objects.create(author=self.user, text='Тест')
+        # Недостающие счётчики создаются при первом чтении, то есть
+        # записью; заводим их заранее.
+        counters.recount()
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def queries(self, url, method='get', **data):
+        with CaptureQueriesContext(connections['replica']) as replica:
+            with CaptureQueriesContext(connection) as primary:
+                response = getattr(self.client, method)(url, data)
+        return response, len(primary), len(replica)
+
+    def test_feeds_read_from_replica(self):
+        """Ленты читаются с реплики, сессия — с основной базы."""
+        for url in (reverse('posts:index'),
+                    reverse('posts:profile', args=[self.user.username]),
+                    reverse('posts:post_detail', args=[self.post.id])):
+            with self.subTest(url=url):
+                response, primary, replica = self.queries(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertGreater(replica, 0)
+                self.assertNotIn(routers.PIN_COOKIE, response.cookies)
+
+    def test_other_views_use_primary(self):
+        """Остальные представления не трогают реплику."""
+        _, _, replica = self.queries(reverse('posts:post_create'))
+        self.assertEqual(replica, 0)
+
+    def test_reads_after_write_stick_to_primary(self):
+        """После записи браузер какое-то время читает с основной базы."""
+        response, _, _ = self.queries(
+            reverse('posts:add_comment', args=[self.post.id]), 'post',
+            text='Комментарий')
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        _, primary, replica = self.queries(reverse('posts:index'))
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        """По истечении окна чтение снова уходит на реплику."""
+        self.queries(reverse('posts:add_comment', args=[self.post.id]),
+                     'post', text='Комментарий')
+        _, _, replica = self.queries(reverse('posts:index'))
+        self.assertGreater(replica, 0)
+
+
+class ConnectionHealthTest(SimpleTestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.name = os.path.join(directory, 'health.sqlite3')
+
+    def wrapper(self, alias='health-test', **options):
+        default = connections['default']
+        settings_dict = {**default.settings_dict, 'NAME': self.name,
+                         **options}
+        wrapper = default.__class__(settings_dict, alias)
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def value(self, metric, alias='health-test'):
+        return metrics.registry.collect().get((metric.name, (alias,)), 0)
+
+    def test_reused_connection_checked_on_first_cursor(self):
+        """Соединение проверяется один раз, при первом курсоре запроса."""
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        with mock.patch.object(wrapper, 'is_usable',
+                               wraps=wrapper.is_usable) as is_usable:
+            wrapper.close_if_unusable_or_obsolete()
+            is_usable.assert_not_called()
+            wrapper.cursor().execute('SELECT 1')
+            wrapper.cursor().execute('SELECT 1')
+        is_usable.assert_called_once()
+        self.assertEqual(self.value(db.REUSED), 1)
+        self.assertEqual(self.value(db.UNHEALTHY), 0)
+
+    def test_broken_connection_reopened(self):
+        """Соединение, не прошедшее проверку, заменяется новым."""
+        wrapper = self.wrapper()
+        wrapper.ensure_connection()
+        wrapper.close_if_unusable_or_obsolete()
+        with mock.patch.object(wrapper, 'is_usable', return_value=False):
+            wrapper.cursor().execute('SELECT 1')
+        self.assertEqual(self.value(db.UNHEALTHY), 1)
+        self.assertEqual(self.value(db.REUSED), 0)
+        self.assertEqual(self.value(db.OPENED), 2)
+        self.assertEqual(self.value(db.OPEN), 1)
+
+    def test_pool_limit(self):
+        """Соединение сверх CONN_POOL_SIZE не открывается."""
+        options = {'CONN_POOL_SIZE': 1, 'CONN_POOL_TIMEOUT': 0}
+        first = self.wrapper('pool-test', **options)
+        second = self.wrapper('pool-test', **options)
+        first.ensure_connection()
+        with self.assertRaises(OperationalError):
+            second.ensure_connection()
+        first.close()
+        self.assertEqual(self.value(db.OPEN, 'pool-test'), 0)
+        second.ensure_connection()
+
+    @skipUnless(util.find_spec('psycopg2'), 'нужен psycopg2')
+    def test_postgresql_backend_pooled(self):
+        """Бэкенд PostgreSQL получает пул и проверку соединений."""
+        from core.backends.postgresql.base import DatabaseWrapper
+        self.assertTrue(issubclass(DatabaseWrapper, db.ConnectionMixin))
+
+
+class SQLiteCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.location = os.path.join(directory, 'cache.sqlite3')
+        self.cache = self.backend()
+
+    def backend(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_values_round_trip(self):
+        """Значения любых типов читаются так же, как записаны."""
+        values = {'int': 5, 'text': 'фрагмент', 'none': None,
+                  'dict': {'a': [1, 2]}, 'flag': True}
+        self.cache.set_many(values)
+        self.assertEqual(self.cache.get_many(list(values)), values)
+        self.assertIs(self.cache.get('flag'), True)
+        self.assertEqual(self.cache.get('missing', 'default'), 'default')
+        self.assertTrue(self.cache.delete('int'))
+        self.assertFalse(self.cache.has_key('int'))
+
+    def test_shared_between_instances(self):
+        """Запись одного воркера видна другому."""
+        self.cache.set('version', 1, None)
+        other = self.backend()
+        self.assertEqual(other.incr('version'), 2)
+        self.assertEqual(self.cache.get('version'), 2)
+        self.assertFalse(other.add('version', 10))
+
+    def test_write_counter_is_thread_safe(self):
+        """Счётчик записей до очистки не теряет записи из разных потоков."""
+        cache = self.backend(CULL_EVERY=10 ** 6)
+        threads = [threading.Thread(target=lambda: [
+            cache.maybe_cull() for _ in range(5000)]) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache._writes, 20000)
+
+    def test_expiry(self):
+        """Просроченная запись не читается, add её перезаписывает."""
+        self.cache.set('key', 'value', 0.05)
+        self.assertEqual(self.cache.get('key'), 'value')
+        time.sleep(0.1)
+        self.assertIsNone(self.cache.get('key'))
+        self.assertTrue(self.cache.add('key', 'new'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_incr_is_atomic(self):
+        """Одновременные incr из потоков не теряют обновлений."""
+        self.cache.set('counter', 0, None)
+
+        def worker():
+            cache = self.backend()
+            for _ in range(50):
+                cache.incr('counter')
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.cache.get('counter'), 200)
+
+    def test_lru_eviction(self):
+        """При переполнении вытесняются давно не читанные записи."""
+        cache = self.backend(MAX_ENTRIES=10, CULL_EVERY=1,
+                             CULL_FREQUENCY=5)
+        cache.set('hot', 'value')
+        connection = cache.connection()
+        for index in range(20):
+            cache.set(f'cold-{index}', 'value')
+            connection.execute("UPDATE cache SET accessed = 0 "
+                               "WHERE key LIKE '%cold%'")
+        count = connection.execute('SELECT count(*) FROM cache').fetchone()
+        self.assertLessEqual(count[0], 10)
+        self.assertEqual(cache.get('hot'), 'value')
+
+    def test_size_limit(self):
+        """Суммарный размер записей не превышает MAX_SIZE."""
+        cache = self.backend(MAX_SIZE=10000, CULL_EVERY=1)
+        for index in range(20):
+            cache.set(f'key-{index}', 'x' * 1000)
+        size = cache.connection().execute(
+            'SELECT sum(size) FROM cache').fetchone()[0]
+        self.assertLessEqual(size, 10000)
+
+
+class TieredCacheTest(SimpleTestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.tiered = TieredCache(lock_timeout=2)
+        self.calls = 0
+
+    def compute(self, value='fresh', pause=0.0):
+        def compute():
+            self.calls += 1
+            time.sleep(pause)
+            return value
+        return compute
+
+    def test_local_copy_spares_shared_cache(self):
+        """Повторное чтение обслуживается копией в памяти процесса."""
+        self.tiered.get_or_set('key', self.compute(), 60)
+        cache.delete('key')
+        value, computed = self.tiered.get_or_set('key', self.compute(), 60)
+        self.assertEqual((value, computed), ('fresh', False))
+        self.assertEqual(self.calls, 1)
+
+    def test_single_flight(self):
+        """Пустой ключ вычисляет один поток, остальные ждут результат."""
+        results = []
+
+        def worker():
+            results.append(self.tiered.get_or_set(
+                'key', self.compute(pause=0.2), 60)[0])
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, ['fresh'] * 8)
+
+    def test_waiter_takes_over_after_failure(self):
+        """Если считавший упал, ждущий не ждёт lock_timeout до конца."""
+        self.assertTrue(self.tiered.acquire('key'))
+        timer = threading.Timer(0.05, self.tiered.release, ('key',))
+        timer.start()
+        self.addCleanup(timer.join)
+        start = time.monotonic()
+        value, computed = self.tiered.get_or_set('key', self.compute(), 60)
+        self.assertEqual((value, computed), ('fresh', True))
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(self.calls, 1)
+
+    def test_feed_cache_follows_settings(self):
+        """Общий кеш лент пересоздаётся при смене настроек."""
+        with override_settings(FEED_CACHE_LOCK_TIMEOUT=1):
+            self.assertEqual(feed_cache.tiered().lock_timeout, 1)
+        self.assertEqual(feed_cache.tiered().lock_timeout,
+                         settings.FEED_CACHE_LOCK_TIMEOUT)
+
+    def test_stale_served_while_revalidating(self):
+        """Пока другой воркер пересчитывает ключ, отдаётся прежнее."""
+        self.tiered.write('key', 'stale', -1, 0.0)
+        self.assertTrue(self.tiered.acquire('key'))
+        value, computed = self.tiered.get_or_set('key', self.compute(), 60)
+        self.assertEqual((value, computed), ('stale', False))
+        self.assertEqual(self.calls, 0)
+        self.tiered.release('key')
+        value, computed = self.tiered.get_or_set('key', self.compute(), 60)
+        self.assertEqual((value, computed), ('fresh', True))
+
+    def test_early_refresh(self):
+        """Долго считаемое значение пересчитывается до срока."""
+        self.tiered.write('key', 'old', 10, 1.0)
+        with mock.patch('core.tiered.random.random', return_value=1.0):
+            self.assertEqual(
+                self.tiered.get_or_set('key', self.compute(), 60)[0], 'old')
+        with mock.patch('core.tiered.random.random', return_value=1e-9):
+            self.assertEqual(
+                self.tiered.get_or_set('key', self.compute(), 60)[0], 'fresh')
+        self.assertEqual(self.calls, 1)
+
+
+class StartupBenchmarkTest(SimpleTestCase):
+
+    def test_parse_importtime(self):
+        """Отчёт -X importtime раскладывается по пакетам."""
+        output = (
+            'import time: self [us] | cumulative | imported package\n'
+            'import time:       100 |        100 |     django.utils\n'
+            'import time:       300 |        400 |   django\n'
+            'import time:        50 |         50 | posts.models\n'
+        )
+        rows = startup.parse_importtime(output)
+        self.assertEqual(rows[1], ('django', 300, 400))
+        self.assertEqual(startup.by_package(rows),
+                         {'django': 0.0004, 'posts': 0.00005})
+
+    def test_probe_measures_cold_start(self):
+        """Замер запускает отдельный процесс и первый запрос к приложению."""
+        result = startup.probe(['/about/author/'])
+        self.assertGreater(result.setup, 0)
+        self.assertEqual(result.requests[0]['app'], 'about')
+        self.assertEqual(result.requests[0]['status'], 200)
+        self.assertIn('django', result.packages)
+
+
+class TemplateWarmupTest(SimpleTestCase):
+    def test_is_cached(self):
+        """is_cached отличает движок с cached.Loader от обычного."""
+        engine = warmup.default_engine()
+        self.assertTrue(
+            warmup.is_cached(warmup._copy(engine, warmup.CACHED_LOADERS)))
+        self.assertFalse(
+            warmup.is_cached(warmup._copy(engine, warmup.PLAIN_LOADERS)))
+
+    def test_warm_compiles_every_template(self):
+        """warm() разбирает все шаблоны из templates/ без ошибок."""
+        timings, errors = warmup.warm()
+        self.assertEqual(errors, {})
+        self.assertIn('base.html', timings)
+        self.assertIn('posts/includes/thumbnail.html', timings)
+        self.assertEqual(set(timings), set(warmup.template_names()))
+
+    def test_warm_reports_broken_template(self):
+        """Шаблон с ошибкой попадает в словарь ошибок, а не роняет warm()."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'broken.html'), 'w') as file:
+            file.write('{% if %}')
+        with open(os.path.join(directory, 'fine.html'), 'w') as file:
+            file.write('{{ value }}')
+        engine = warmup.Engine(dirs=[directory])
+        timings, errors = warmup.warm(engine)
+        self.assertEqual(list(timings), ['fine.html'])
+        self.assertEqual(list(errors), ['broken.html'])
+
+    def test_load_times(self):
+        """Замер возвращает оба времени для каждого шаблона."""
+        rows = warmup.load_times(runs=2)
+        self.assertEqual({name for name, _, _ in rows},
+                         set(warmup.template_names()))
+        for _, plain, cached in rows:
+            self.assertGreater(plain, 0)
+            self.assertGreater(cached, 0)
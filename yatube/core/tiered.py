@@ -0,0 +1,153 @@
+"""
+Двухуровневый кеш с защитой от лавины пересчётов.
+
+L1 — небольшой LRU в памяти процесса с коротким TTL, L2 — общий кеш
+Django. Значение хранится в L2 вместе с мягким сроком годности и
+временем, которое ушло на его вычисление; жёсткий TTL в L2 длиннее на
+stale_timeout, и до его истечения устаревшее значение ещё можно отдать.
+
+get_or_set пересчитывает значение только в одном воркере:
+
+* незадолго до мягкого срока запрос с вероятностью, растущей по мере
+  приближения срока (XFetch), берёт блокировку и пересчитывает заранее;
+* после мягкого срока пересчитывает тот, кто взял блокировку, а
+  остальные отдают устаревшее значение;
+* если значения нет совсем, остальные ждут результата не дольше
+  lock_timeout и только потом считают сами; если блокировка снята,
+  а значения так и нет (тот, кто считал, упал), блокировку берёт один
+  из ждущих и считает сразу.
+
+Блокировка — запись ``<ключ>:lock``, добавленная в L2 через add, поэтому
+она общая для всех процессов, которые делят L2.
+"""
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import caches
+
+
+class LocalCache:
+    """LRU в памяти процесса."""
+
+    def __init__(self, max_entries=256, timeout=5.0):
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, key):
+        with self.lock:
+            item = self.entries.get(key)
+            if item is None:
+                return None
+            entry, expires = item
+            if expires <= time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry) -> None:
+        with self.lock:
+            self.entries[key] = (entry, time.monotonic() + self.timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+
+class TieredCache:
+
+    def __init__(self, alias='default', l1_entries=256, l1_timeout=5.0,
+                 stale_timeout=60, lock_timeout=5.0, beta=1.0):
+        self.alias = alias
+        self.local = LocalCache(l1_entries, l1_timeout)
+        self.stale_timeout = stale_timeout
+        self.lock_timeout = lock_timeout
+        self.beta = beta
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def read(self, key):
+        entry = self.local.get(key)
+        if entry is None:
+            entry = self.shared.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+        return entry
+
+    def write(self, key, value, timeout, delta) -> tuple:
+        if callable(timeout):
+            timeout = timeout()
+        entry = (value, time.time() + timeout, delta)
+        self.shared.set(key, entry, timeout + self.stale_timeout)
+        self.local.set(key, entry)
+        return entry
+
+    def expiring(self, entry, now) -> bool:
+        """Пора ли пересчитать значение (с вероятностным опережением)."""
+        _, expires, delta = entry
+        return now - delta * self.beta * math.log(random.random()) >= expires
+
+    @staticmethod
+    def lock_key(key) -> str:
+        return f'{key}:lock'
+
+    def acquire(self, key) -> bool:
+        return self.shared.add(self.lock_key(key), 1,
+                               math.ceil(self.lock_timeout))
+
+    def release(self, key) -> None:
+        self.shared.delete(self.lock_key(key))
+
+    def compute(self, key, compute, timeout):
+        start = time.monotonic()
+        try:
+            value = compute()
+            self.write(key, value, timeout, time.monotonic() - start)
+        finally:
+            self.release(key)
+        return value
+
+    def get_or_set(self, key, compute, timeout):
+        """
+        Значение из кеша или результат compute().
+
+        timeout — мягкий срок в секундах или функция, которая вернёт его
+        после вычисления. Возвращает пару (значение, пересчитано ли оно
+        этим вызовом).
+        """
+        entry = self.read(key)
+        if entry is not None:
+            if not self.expiring(entry, time.time()):
+                return entry[0], False
+            if self.acquire(key):
+                return self.compute(key, compute, timeout), True
+            return entry[0], False
+        if self.acquire(key):
+            return self.compute(key, compute, timeout), True
+        deadline = time.monotonic() + self.lock_timeout
+        pause = 0.005
+        while time.monotonic() < deadline:
+            time.sleep(pause)
+            pause = min(pause * 2, 0.1)
+            found = self.shared.get_many([key, self.lock_key(key)])
+            entry = found.get(key)
+            if entry is not None:
+                self.local.set(key, entry)
+                return entry[0], False
+            if self.lock_key(key) not in found and self.acquire(key):
+                # Блокировку сняли, не записав значения: считаем сами.
+                return self.compute(key, compute, timeout), True
+        # Тот, кто держал блокировку, не успел или упал: считаем сами.
+        value = compute()
+        self.write(key, value, timeout, 0.0)
+        return value, True
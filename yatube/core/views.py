@@ -1,5 +1,9 @@
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
 from django.shortcuts import render
 
+from core import metrics as app_metrics
+
 
 def page_not_found(request, exception):
     """Модуль для представления страницы с кодом 404."""
@@ -14,3 +18,15 @@ def csrf_failure(request, exception):
 def server_error(request):
     """ Модуль для представления страницы с кодом 500."""
     return render(request, 'core/500.html', status=500)
+
+
+def metrics(request):
+    """
+    Модуль для выдачи метрик в текстовом формате Prometheus.
+    Метрики видны с адресов INTERNAL_IPS и сотрудникам.
+    """
+    if (request.META.get('REMOTE_ADDR') not in settings.INTERNAL_IPS
+            and not request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(app_metrics.registry.render(),
+                        content_type='text/plain; version=0.0.4')
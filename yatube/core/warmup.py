@@ -0,0 +1,94 @@
+"""
+Предварительная компиляция шаблонов.
+
+С cached.Loader шаблон разбирается один раз на процесс, но первый
+запрос к каждой странице всё равно платит за разбор её шаблона,
+base.html и всех включений. warm() компилирует все шаблоны из
+каталогов DIRS заранее: yatube/wsgi.py вызывает его при старте
+воркера, а команда ``manage.py warm_templates`` заодно проверяет, что
+все шаблоны разбираются.
+"""
+import os
+import statistics
+import time
+
+from django.template import Engine, TemplateSyntaxError, engines
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_LOADERS = [('django.template.loaders.cached.Loader', PLAIN_LOADERS)]
+
+
+def default_engine() -> Engine:
+    return engines['django'].engine
+
+
+def is_cached(engine: Engine) -> bool:
+    return any(loader.__module__ == 'django.template.loaders.cached'
+               for loader in engine.template_loaders)
+
+
+def template_names(engine: Engine = None) -> list:
+    """Имена всех шаблонов из каталогов DIRS движка."""
+    engine = engine or default_engine()
+    names = []
+    for directory in engine.dirs:
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.relpath(os.path.join(root, filename),
+                                       directory)
+                names.append(path.replace(os.sep, '/'))
+    return sorted(set(names))
+
+
+def warm(engine: Engine = None) -> tuple:
+    """
+    Компилирует все шаблоны движка.
+
+    Возвращает словарь «шаблон — секунды разбора» и словарь ошибок.
+    """
+    engine = engine or default_engine()
+    timings = {}
+    errors = {}
+    for name in template_names(engine):
+        start = time.perf_counter()
+        try:
+            engine.get_template(name)
+        except (TemplateSyntaxError, UnicodeDecodeError) as error:
+            errors[name] = str(error)
+            continue
+        timings[name] = time.perf_counter() - start
+    return timings, errors
+
+
+def _copy(engine: Engine, loaders) -> Engine:
+    return Engine(dirs=engine.dirs, loaders=loaders,
+                  context_processors=engine.context_processors,
+                  libraries=engine.libraries, debug=False)
+
+
+def load_times(runs=20, engine: Engine = None) -> list:
+    """
+    Время получения каждого шаблона без кеша и из прогретого кеша.
+
+    Список (шаблон, секунды без кеша, секунды с кешем) — медианы runs
+    вызовов get_template.
+    """
+    engine = engine or default_engine()
+    plain = _copy(engine, PLAIN_LOADERS)
+    cached = _copy(engine, CACHED_LOADERS)
+    timings, _ = warm(cached)
+    result = []
+    for name in timings:
+        measured = []
+        for target in (plain, cached):
+            samples = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                target.get_template(name)
+                samples.append(time.perf_counter() - start)
+            measured.append(statistics.median(samples))
+        result.append((name, *measured))
+    return result
@@ -0,0 +1,395 @@
+"""
+Бюджеты запросов и времени ответа для представлений лент.
+
+Каждое представление замеряется дважды: «холодным» (кеш очищен перед
+каждым запросом) и «тёплым». Для холодного и тёплого запуска задан
+потолок числа SQL-запросов, для холодного — пороги p50/p95 в секундах.
+Бюджеты проверяет posts/tests/test_budgets.py (пороги времени — только
+с YATUBE_BENCH=1), а команда ``manage.py benchmark_views`` печатает
+таблицу замеров на текущей базе, чтобы сравнивать их между коммитами.
+"""
+import math
+import random
+import statistics
+import threading
+import time
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import CommandError
+from django.db import OperationalError, connection, connections, transaction
+from django.template import Context, Template
+from django.test import Client, RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import warmup
+from posts.models import Comment, Group, Post, User
+
+# Карточки лент читают автора и группу тем же запросом
+# (PostQuerySet.for_feed). Тёплый запрос берёт карточки и навигацию из
+# фрагмента {% feedcache %} и не выполняет запросов пагинатора.
+# Группа, автор и пост ищутся дважды: для ETag (posts.conditional)
+# и в самом view.
+BUDGETS = {
+    'index': {'cold': 5, 'warm': 4, 'p50': 0.15, 'p95': 0.5},
+    'group_posts': {'cold': 6, 'warm': 4, 'p50': 0.15, 'p95': 0.5},
+    'profile': {'cold': 7, 'warm': 6, 'p50': 0.15, 'p95': 0.5},
+    'post_detail': {'cold': 6, 'warm': 6, 'p50': 0.15, 'p95': 0.5},
+    'follow_index': {'cold': 7, 'warm': 5, 'p50': 0.15, 'p95': 0.5},
+}
+
+
+@dataclass
+class Measurement:
+    view: str
+    cold_queries: int
+    warm_queries: int
+    p50: float
+    p95: float
+
+
+EMPTY = ('В базе нет постов с группами для замеров: сначала выполните '
+         '"manage.py seed_yatube" или запустите замер с --seed.')
+
+
+def targets() -> dict:
+    """Адреса замеряемых представлений на текущих данных."""
+    busiest = (Post.objects.order_by('-comments_count', '-id')
+               .values('id', 'group__slug', 'author__username').first())
+    group = (Group.objects.filter(posts__isnull=False)
+             .values_list('slug', flat=True).first())
+    if busiest is None or group is None:
+        raise CommandError(EMPTY)
+    return {
+        'index': reverse('posts:index'),
+        'group_posts': reverse('posts:group_list', args=[group]),
+        'profile': reverse('posts:profile',
+                           args=[busiest['author__username']]),
+        'post_detail': reverse('posts:post_detail', args=[busiest['id']]),
+        'follow_index': reverse('posts:follow_index'),
+    }
+
+
+def reader() -> User:
+    """Пользователь с наибольшим числом подписок."""
+    user = User.objects.order_by('-stats__following_count', 'id').first()
+    if user is None:
+        raise CommandError(EMPTY)
+    return user
+
+
+def count_queries(client: Client, url: str) -> int:
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    return len(context.captured_queries)
+
+
+# Профиль SQLite «как было»: журнал отката и fsync на каждую фиксацию.
+BASELINE_SQLITE = {'journal_mode': 'delete', 'synchronous': 'full'}
+
+
+@dataclass
+class Throughput:
+    reads: int
+    writes: int
+    errors: int
+    seconds: float
+
+    @property
+    def ops(self) -> float:
+        return (self.reads + self.writes) / self.seconds
+
+
+def _worker(deadline, write_share, rng_seed, post_ids, user_ids, totals,
+            lock):
+    rng = random.Random(rng_seed)
+    reads = writes = errors = 0
+    try:
+        while time.monotonic() < deadline:
+            try:
+                if rng.random() < write_share:
+                    # Как add_comment: чтение и запись в одной транзакции.
+                    with transaction.atomic():
+                        post = Post.objects.get(id=rng.choice(post_ids))
+                        Comment.objects.create(
+                            post=post, author_id=rng.choice(user_ids),
+                            text='Нагрузочный комментарий')
+                    writes += 1
+                else:
+                    list(Post.objects.select_related('author', 'group')
+                         .order_by('-pub_date', '-id')[:10])
+                    reads += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        connection.close()
+    with lock:
+        totals['reads'] += reads
+        totals['writes'] += writes
+        totals['errors'] += errors
+
+
+def concurrency(threads=8, seconds=5.0, write_share=0.2,
+                rng_seed=0) -> Throughput:
+    """Смешанная нагрузка чтения и записи из нескольких потоков."""
+    post_ids = list(Post.objects.values_list('id', flat=True)[:1000])
+    user_ids = list(User.objects.values_list('id', flat=True)[:1000])
+    totals = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+    deadline = time.monotonic() + seconds
+    workers = [threading.Thread(target=_worker, args=(
+        deadline, write_share, rng_seed + index, post_ids, user_ids, totals,
+        lock)) for index in range(threads)]
+    start = time.monotonic()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return Throughput(seconds=time.monotonic() - start, **totals)
+
+
+@override_settings(DEBUG=False)
+def wsgi_throughput(path='/', requests=500, threads=4,
+                    max_age=None) -> float:
+    """
+    Запросов в секунду через WSGI-обработчик Django.
+
+    В отличие от тестового клиента, обработчик шлёт request_started и
+    request_finished, поэтому соединения живут по CONN_MAX_AGE.
+    max_age временно подменяет CONN_MAX_AGE всех алиасов.
+    """
+    saved = {alias: options.get('CONN_MAX_AGE', 0)
+             for alias, options in connections.databases.items()}
+    if max_age is not None:
+        for options in connections.databases.values():
+            options['CONN_MAX_AGE'] = max_age
+    handler = WSGIHandler()
+    factory = RequestFactory()
+
+    def start_response(status, headers):
+        pass
+
+    def worker(count):
+        try:
+            for _ in range(count):
+                handler(factory.get(path).environ, start_response).close()
+        finally:
+            connections.close_all()
+
+    workers = [threading.Thread(target=worker, args=(requests // threads,))
+               for _ in range(threads)]
+    start = time.monotonic()
+    try:
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+    finally:
+        for alias, value in saved.items():
+            connections.databases[alias]['CONN_MAX_AGE'] = value
+    return requests // threads * threads / (time.monotonic() - start)
+
+
+def cache_throughput(backend, operations=2000, size=4096) -> dict:
+    """Операций в секунду для set, get и incr на одном бэкенде кеша."""
+    fragment = 'x' * size
+    keys = [f'bench-fragment:{index}' for index in range(operations)]
+    result = {}
+    start = time.perf_counter()
+    for key in keys:
+        backend.set(key, fragment)
+    result['set'] = operations / (time.perf_counter() - start)
+    start = time.perf_counter()
+    for key in keys:
+        backend.get(key)
+    result['get'] = operations / (time.perf_counter() - start)
+    backend.set('bench-version', 0, None)
+    start = time.perf_counter()
+    for _ in range(operations):
+        backend.incr('bench-version')
+    result['incr'] = operations / (time.perf_counter() - start)
+    backend.clear()
+    return result
+
+
+def percentile(values, share: float) -> float:
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    return ordered[max(math.ceil(share * len(ordered)) - 1, 0)]
+
+
+def measure(client: Client, view: str, url: str, runs=20) -> Measurement:
+    cache.clear()
+    cold_queries = count_queries(client, url)
+    warm_queries = count_queries(client, url)
+    timings = []
+    for _ in range(runs):
+        cache.clear()
+        start = time.perf_counter()
+        client.get(url)
+        timings.append(time.perf_counter() - start)
+    return Measurement(view, cold_queries, warm_queries,
+                       statistics.median(timings), percentile(timings, 0.95))
+
+
+# Как и в тестах, замеры идут без debug_toolbar, который включается
+# при DEBUG для запросов с 127.0.0.1.
+@override_settings(DEBUG=False)
+def run(runs=20) -> list:
+    client = Client()
+    client.force_login(reader())
+    return [measure(client, view, url, runs)
+            for view, url in targets().items()]
+
+
+@override_settings(DEBUG=False)
+def template_pages(runs=10) -> list:
+    """
+    Время ответа страниц лент с перечитыванием шаблонов и с cached.Loader.
+
+    Список (представление, секунды без кеша, секунды с кешем) — медианы
+    runs запросов с очищенным кешем фрагментов, чтобы шаблоны карточек
+    рисовались каждый раз.
+    """
+    client = Client()
+    client.force_login(reader())
+    urls = targets()
+    result = {view: [] for view in urls}
+    for loaders in (warmup.PLAIN_LOADERS, warmup.CACHED_LOADERS):
+        config = settings.TEMPLATES[0]
+        templates = [{**config,
+                      'OPTIONS': {**config['OPTIONS'], 'loaders': loaders}}]
+        with override_settings(TEMPLATES=templates):
+            for view, url in urls.items():
+                client.get(url)
+                timings = []
+                for _ in range(runs):
+                    cache.clear()
+                    start = time.perf_counter()
+                    client.get(url)
+                    timings.append(time.perf_counter() - start)
+                result[view].append(statistics.median(timings))
+    return [(view, *timings) for view, timings in result.items()]
+
+
+# Прежняя разметка лент для сравнения с posts.cards: карточка
+# с тегами {% url %} и include миниатюры на каждый пост.
+INCLUDE_CARDS = """
+{% for post in posts %}
+  <article>
+    <ul>
+      <li>Автор: <a href="{% url 'posts:profile' post.author.username %}">
+        <b>{{ post.author.get_full_name }}</b></a></li>
+      <li>Дата публикации: {{ post.pub_date|date:'d M Y' }}</li>
+    </ul>
+    <p>
+      {% include 'posts/includes/thumbnail.html' with geometry="960x339" %}
+    </p>
+    <p>{{ post.text }}</p>
+    <ul>
+      {% if post.group %}
+        <li><a href="{% url 'posts:group_list' post.group.slug %}">
+          все записи группы {{ post.group.title }}</a></li>
+      {% endif %}
+      <li><a href="{% url 'posts:post_detail' post.id %}">
+        подробности поста № {{ post.id }}</a></li>
+    </ul>
+  </article>
+  {% if not forloop.last %}<hr>{% endif %}
+{% endfor %}
+"""
+POST_CARDS = """
+{% load feeds %}
+{% for card in posts|post_cards:"960x339" %}
+  {{ card }}
+  {% if not forloop.last %}<hr>{% endif %}
+{% endfor %}
+"""
+
+
+@override_settings(DEBUG=False)
+def card_render(runs=50, count=None) -> dict:
+    """
+    Время отрисовки одной карточки поста, медиана runs страниц.
+
+    {'include': ..., 'post_cards cold': ..., 'post_cards warm': ...}
+    в секундах — для цикла с include и {% url %} и для фильтра
+    post_cards (posts.cards) с пустым кешем и с готовыми карточками.
+    """
+    posts = list(Post.objects.for_feed()
+                 .order_by('-pub_date')[:count or settings.PERPAGE])
+    if not posts:
+        return {}
+    variants = {'include': (Template(INCLUDE_CARDS), False),
+                'post_cards cold': (Template(POST_CARDS), True),
+                'post_cards warm': (Template(POST_CARDS), False)}
+    result = {}
+    for name, (template, cold) in variants.items():
+        context = Context({'posts': posts})
+        template.render(context)
+        timings = []
+        for _ in range(runs):
+            if cold:
+                cache.clear()
+            start = time.perf_counter()
+            template.render(context)
+            timings.append(time.perf_counter() - start)
+        result[name] = statistics.median(timings) / len(posts)
+    return result
+
+
+def explain(sql: str) -> list:
+    prefix = ('EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite'
+              else 'EXPLAIN ')
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql)
+        return [str(row[-1]) for row in cursor.fetchall()]
+
+
+def query_plans(client: Client, url: str) -> list:
+    """Планы упорядоченных выборок страницы: пары (sql, строки плана)."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        client.get(url)
+    return [(query['sql'], explain(query['sql']))
+            for query in context.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'ORDER BY' in query['sql']]
+
+
+@override_settings(DEBUG=False)
+def plans(client=None) -> dict:
+    if client is None:
+        client = Client()
+        client.force_login(reader())
+    return {view: query_plans(client, url)
+            for view, url in targets().items()}
+
+
+def format_plans(view_plans) -> str:
+    lines = []
+    for view, queries in view_plans.items():
+        lines.append(f'{view}:')
+        for sql, plan in queries:
+            lines.append(f'  {sql[:100]}')
+            lines.extend(f'    {step}' for step in plan)
+    return '\n'.join(lines)
+
+
+def format_table(measurements) -> str:
+    header = ('view', 'cold q', 'budget', 'warm q', 'budget',
+              'p50 ms', 'p95 ms')
+    rows = [header]
+    for item in measurements:
+        budget = BUDGETS[item.view]
+        rows.append((item.view, item.cold_queries, budget['cold'],
+                     item.warm_queries, budget['warm'],
+                     f'{item.p50 * 1000:.1f}', f'{item.p95 * 1000:.1f}'))
+    widths = [max(len(str(row[i])) for row in rows)
+              for i in range(len(header))]
+    return '\n'.join(
+        '  '.join(str(cell).ljust(width) for cell, width in zip(row, widths))
+        for row in rows)
@@ -0,0 +1,69 @@
+"""
+Валидаторы условных GET-запросов к лентам и страницам постов.
+
+ETag страницы собирается из версий областей posts.feed_cache, которые
+сигналы сдвигают при создании, правке и удалении постов, групп и
+подписок, и из немногих полей, видных только на этой странице. Для
+совпавшего If-None-Match декоратор condition отвечает 304, не выполняя
+выборку ленты и отрисовку шаблона.
+
+Шапка страницы и кнопки зависят от пользователя, поэтому его id тоже
+входит в ETag. Страницы вошедшего пользователя содержат формы
+с {% csrf_token %}, а вход меняет CSRF-секрет: секрет из cookie тоже
+входит в ETag, иначе после повторного входа браузер получил бы 304
+и отправил форму со старым токеном.
+"""
+from hashlib import md5
+
+from django.db.models import OuterRef, Subquery
+from django.utils.encoding import force_bytes
+
+from posts import feed_cache
+from posts.models import Comment, Group, Post, User
+
+
+def _etag(name: str, request, scopes, *extra) -> str:
+    csrf = ''
+    if request.user.is_authenticated:
+        csrf = request.META.get('CSRF_COOKIE', '')
+    parts = [name, request.user.id or 0, csrf, *scopes,
+             *feed_cache.versions(['all', *scopes]), *extra]
+    return md5(force_bytes(':'.join(map(str, parts)))).hexdigest()
+
+
+def index_etag(request) -> str:
+    return _etag('index', request, ['index', 'totals'])
+
+
+def group_etag(request, slug: str):
+    group_id = (Group.objects.filter(slug=slug)
+                .values_list('id', flat=True).first())
+    if group_id is None:
+        return None
+    return _etag('group', request, [f'group:{group_id}'])
+
+
+def profile_etag(request, username: str):
+    author_id = (User.objects.filter(username=username)
+                 .values_list('id', flat=True).first())
+    if author_id is None:
+        return None
+    scopes = [f'profile:{author_id}']
+    if request.user.is_authenticated:
+        # Кнопка «Подписаться/Отписаться».
+        scopes.append(f'follow:{request.user.id}')
+    return _etag('profile', request, scopes)
+
+
+def post_etag(request, post_id: int):
+    last_comment = (Comment.objects.filter(post=OuterRef('pk'))
+                    .order_by('-created').values('created')[:1])
+    row = (Post.objects.filter(id=post_id)
+           .annotate(last_comment=Subquery(last_comment))
+           .values_list('author_id', 'comments_count', 'last_comment')
+           .first())
+    if row is None:
+        return None
+    author_id, comments_count, last_comment = row
+    return _etag('post', request, [f'profile:{author_id}'], post_id,
+                 comments_count, last_comment)
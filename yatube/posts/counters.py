@@ -0,0 +1,107 @@
+"""
+Денормализованные счётчики.
+
+Счётчики сдвигаются обработчиками сигналов при создании и удалении
+пользователей, постов, комментариев и подписок. Если счётчики разошлись
+с данными (bulk_create, ручные правки в базе), их пересчитывает команда
+``manage.py recount_counters``. Уменьшение не опускает счётчик ниже
+нуля: столбцы беззнаковые, и на разошедшемся счётчике CHECK-ограничение
+иначе сломало бы удаление.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+from posts.models import (AuthorStats, Comment, Follow, Post, SiteCounter,
+                          User)
+
+SITE_COUNTERS = {
+    'users': User,
+    'posts': Post,
+    'follows': Follow,
+}
+
+
+def total(name: str) -> int:
+    """Значение общего счётчика; отсутствующий счётчик пересчитывается."""
+    value = (SiteCounter.objects.filter(name=name)
+             .values_list('value', flat=True).first())
+    if value is None:
+        value = SITE_COUNTERS[name].objects.count()
+        SiteCounter.objects.get_or_create(name=name,
+                                          defaults={'value': value})
+    return value
+
+
+def bump_total(name: str, delta: int) -> None:
+    with transaction.atomic():
+        updated = SiteCounter.objects.filter(name=name).update(
+            value=F('value') + delta)
+        if not updated:
+            total(name)
+
+
+def author_stats(user_id: int) -> AuthorStats:
+    """Счётчики автора; отсутствующая строка создаётся пересчётом."""
+    stats = AuthorStats.objects.filter(user_id=user_id).first()
+    if stats is None:
+        stats, _ = AuthorStats.objects.get_or_create(
+            user_id=user_id, defaults=_count_author(user_id))
+    return stats
+
+
+def _shifted(field: str, delta: int):
+    """F(field) + delta, не опускающийся ниже нуля."""
+    if delta >= 0:
+        return F(field) + delta
+    return Greatest(F(field) + delta, 0)
+
+
+def bump_author(user_id: int, field: str, delta: int) -> None:
+    with transaction.atomic():
+        updated = AuthorStats.objects.filter(user_id=user_id).update(
+            **{field: _shifted(field, delta)})
+        if not updated and delta > 0:
+            author_stats(user_id)
+
+
+def bump_comments(post_id: int, delta: int) -> None:
+    Post.objects.filter(id=post_id).update(
+        comments_count=_shifted('comments_count', delta))
+
+
+def _count_author(user_id: int) -> dict:
+    return {
+        'posts_count': Post.objects.filter(author_id=user_id).count(),
+        'followers_count': Follow.objects.filter(author_id=user_id).count(),
+        'following_count': Follow.objects.filter(user_id=user_id).count(),
+    }
+
+
+def recount() -> None:
+    """Пересчитывает все счётчики по данным."""
+    with transaction.atomic():
+        for name, model in SITE_COUNTERS.items():
+            SiteCounter.objects.update_or_create(
+                name=name, defaults={'value': model.objects.count()})
+        AuthorStats.objects.all().delete()
+        posts = dict(Post.objects.values_list('author')
+                     .annotate(total=Count('id')).order_by())
+        followers = dict(Follow.objects.values_list('author')
+                         .annotate(total=Count('id')).order_by())
+        following = dict(Follow.objects.values_list('user')
+                         .annotate(total=Count('id')).order_by())
+        AuthorStats.objects.bulk_create(
+            (AuthorStats(user_id=user_id,
+                         posts_count=posts.get(user_id, 0),
+                         followers_count=followers.get(user_id, 0),
+                         following_count=following.get(user_id, 0))
+             for user_id in User.objects.values_list('id', flat=True)
+             .iterator()),
+            batch_size=500,
+        )
+        comments = (Comment.objects.filter(post=OuterRef('pk')).order_by()
+                    .values('post').annotate(total=Count('id'))
+                    .values('total'))
+        Post.objects.update(comments_count=Coalesce(
+            Subquery(comments, output_field=IntegerField()), 0))
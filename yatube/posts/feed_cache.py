@@ -0,0 +1,176 @@
+"""
+Версионированный кеш фрагментов лент.
+
+Каждая лента зависит от набора областей (scope): ``index``,
+``group:<id>``, ``profile:<author_id>``, ``follow:<user_id>``, а также
+от общей области ``all``. Версии областей хранятся в кеше, ключ
+фрагмента включает их все, поэтому сигнал об изменении поста, группы
+или подписки сдвигает версию и старые фрагменты просто перестают
+запрашиваться, а TTL может быть долгим. Область ``totals`` сдвигается
+при изменении числа пользователей и подписок: его выводят переключатели
+лент, и от него зависят ETag страниц (posts.conditional).
+
+Карточки постов кешируются поштучно (posts.cards) и зависят от своих
+областей: ``post:<id>`` (пост и его миниатюры), ``author:<id>`` (имя
+автора) и ``group-card:<id>`` (название и адрес группы).
+
+Фрагменты читаются через двухуровневый кеш core.tiered: копия в памяти
+процесса снимает обращения к общему кешу, а истёкший фрагмент
+пересчитывает один воркер, пока остальные отдают прежний.
+"""
+import threading
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.encoding import force_bytes
+
+from core import metrics, routers
+from core.tiered import TieredCache
+from posts.models import Follow
+
+VERSION_PREFIX = 'feed-version'
+FRAGMENT_PREFIX = 'feed-fragment'
+
+_tiered = None
+_tiered_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+REQUESTS = metrics.Counter('yatube_feed_cache_requests_total',
+                           'Обращения к кешу фрагментов лент.', ('result',))
+HIT_RATIO = metrics.Ratio('yatube_feed_cache_hit_ratio',
+                          'Доля попаданий в кеш фрагментов лент.',
+                          REQUESTS, 'result', 'hit')
+
+
+def timeout() -> int:
+    return getattr(settings, 'FEED_CACHE_TIMEOUT', 60 * 60)
+
+
+def _version_key(scope: str) -> str:
+    return f'{VERSION_PREFIX}:{scope}'
+
+
+def _seed() -> int:
+    # Новая версия (и потерянная при вытеснении) не совпадает со старой.
+    return time.time_ns()
+
+
+def versions(scopes) -> list:
+    """Текущие версии областей; недостающие заводятся заново."""
+    keys = [_version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    result = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _seed(), None)
+            found[key] = cache.get(key)
+        result.append(found[key])
+    return result
+
+
+def bump(*scopes) -> None:
+    """
+    Сдвигает версии областей, делая их фрагменты устаревшими.
+
+    Версии переписываются новым _seed() одним set_many: пост автора
+    с тысячами подписчиков сдвигает их ленты одной записью в кеш.
+    """
+    if scopes:
+        version = _seed()
+        cache.set_many({_version_key(scope): version for scope in scopes},
+                       None)
+
+
+def fragment_key(name: str, scopes, request) -> str:
+    """
+    Ключ фрагмента ленты для страницы из ?cursor= (или ?page=).
+
+    Ключ строится по параметрам запроса, а не по готовой странице:
+    при попадании страница из базы не читается вовсе.
+    """
+    scopes = ['all', *scopes]
+    parts = [*scopes, *versions(scopes),
+             request.GET.get('page'), request.GET.get('cursor')]
+    digest = md5(force_bytes(':'.join(map(str, parts)))).hexdigest()
+    return f'{FRAGMENT_PREFIX}:{name}:{digest}'
+
+
+def tiered() -> TieredCache:
+    global _tiered
+    with _tiered_lock:
+        if _tiered is None:
+            _tiered = TieredCache(
+                l1_entries=getattr(settings, 'FEED_CACHE_L1_ENTRIES', 256),
+                l1_timeout=getattr(settings, 'FEED_CACHE_L1_TIMEOUT', 5),
+                stale_timeout=getattr(settings, 'FEED_CACHE_STALE_TIMEOUT',
+                                      60),
+                lock_timeout=getattr(settings, 'FEED_CACHE_LOCK_TIMEOUT', 5),
+            )
+        return _tiered
+
+
+@receiver(setting_changed)
+def reset_tiered(setting, **kwargs):
+    """Настройки FEED_CACHE_* и CACHES читаются заново."""
+    global _tiered
+    if setting.startswith('FEED_CACHE_') or setting == 'CACHES':
+        with _tiered_lock:
+            _tiered = None
+
+
+def fragment_timeout() -> int:
+    ttl = timeout()
+    if routers.used_replica():
+        # Реплика могла отстать от сдвига версии: такой фрагмент
+        # живёт не дольше окна чтения с default после записи.
+        ttl = min(ttl, routers.pin_seconds())
+    return ttl
+
+
+def fragment(key: str, render) -> str:
+    """Фрагмент из кеша или результат render()."""
+    content, computed = tiered().get_or_set(key, render, fragment_timeout)
+    with _stats_lock:
+        _stats['misses' if computed else 'hits'] += 1
+    REQUESTS.inc(result='miss' if computed else 'hit')
+    return content
+
+
+def stats() -> dict:
+    """Число попаданий и промахов кеша лент в этом процессе."""
+    with _stats_lock:
+        result = dict(_stats)
+    requests = result['hits'] + result['misses']
+    result['hit_rate'] = result['hits'] / requests if requests else 0.0
+    return result
+
+
+def post_scopes(post, group_ids=()) -> list:
+    """Области, которые затрагивает изменение поста."""
+    scopes = ['index', f'profile:{post.author_id}']
+    for group_id in {post.group_id, *group_ids}:
+        if group_id:
+            scopes.append(f'group:{group_id}')
+    return scopes
+
+
+def card_scopes(post) -> list:
+    """Области, от которых зависит карточка поста."""
+    scopes = [f'post:{post.id}', f'author:{post.author_id}']
+    if post.group_id:
+        scopes.append(f'group-card:{post.group_id}')
+    return scopes
+
+
+def bump_post(post, group_ids=()) -> None:
+    """Сбрасывает карточку поста и все ленты, в которых он выводится."""
+    followers = Follow.objects.filter(
+        author_id=post.author_id, pushed=True).values_list('user_id',
+                                                           flat=True)
+    bump(f'post:{post.id}', *post_scopes(post, group_ids),
+         *(f'follow:{user_id}' for user_id in followers))
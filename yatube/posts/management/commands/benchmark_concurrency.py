@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Замеряет пропускную способность SQLite при смешанной нагрузке '
+            'чтения и записи из нескольких потоков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=8)
+        parser.add_argument('--seconds', type=float, default=5.0)
+        parser.add_argument('--writes', type=float, default=0.2,
+                            help='Доля операций записи, от 0 до 1.')
+        parser.add_argument('--baseline', action='store_true',
+                            help='Сравнить с журналом отката без '
+                                 'BEGIN IMMEDIATE.')
+
+    def run(self, label):
+        result = benchmarks.concurrency(
+            self.options['threads'], self.options['seconds'],
+            self.options['writes'])
+        self.stdout.write(
+            f'{label:<9} {result.ops:8.1f} оп/с  чтений {result.reads}  '
+            f'записей {result.writes}  ошибок {result.errors}')
+
+    def handle(self, *args, **options):
+        self.options = options
+        if options['baseline']:
+            with override_settings(
+                    SQLITE_PRAGMAS=benchmarks.BASELINE_SQLITE,
+                    SQLITE_IMMEDIATE_TRANSACTIONS=False):
+                self.run('baseline')
+        self.run('tuned')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает число запросов в секунду с постоянными '
+            'соединениями и с новым соединением на каждый запрос.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/')
+        parser.add_argument('--requests', type=int, default=1000)
+        parser.add_argument('--threads', type=int, default=4)
+
+    def handle(self, *args, **options):
+        for label, max_age in (('per-request', 0), ('persistent', None)):
+            rps = benchmarks.wsgi_throughput(
+                options['path'], options['requests'], options['threads'],
+                max_age=max_age)
+            self.stdout.write(f'{label:<12} {rps:8.1f} запросов/с')
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import benchmarks, seeding
+
+
+class Command(BaseCommand):
+    help = ('Замеряет число запросов и время ответа представлений лент '
+            'и печатает таблицу для сравнения между коммитами.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=20,
+                            help='Сколько раз запрашивать каждую страницу.')
+        parser.add_argument('--seed', action='store_true',
+                            help='Сначала наполнить базу тестовыми данными.')
+        parser.add_argument('--plans', action='store_true',
+                            help='Напечатать планы упорядоченных выборок.')
+
+    def handle(self, *args, **options):
+        if options['seed']:
+            seeding.seed()
+        self.stdout.write(
+            benchmarks.format_table(benchmarks.run(options['runs'])))
+        if options['plans']:
+            self.stdout.write(benchmarks.format_plans(benchmarks.plans()))
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Дорабатывает очередь миниатюр картинок постов.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=None,
+                            help='Сколько заданий обработать.')
+        parser.add_argument('--missing', action='store_true',
+                            help='Сначала поставить задания для картинок '
+                                 'без миниатюр.')
+
+    def handle(self, *args, **options):
+        if options['missing']:
+            queued = thumbnails.enqueue_missing()
+            self.stdout.write(f'Поставлено заданий: {queued}.')
+        done = thumbnails.process_pending(options['limit'])
+        self.stdout.write(self.style.SUCCESS(f'Обработано заданий: {done}.'))
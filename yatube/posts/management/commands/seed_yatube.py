@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import seeding
+
+
+class Command(BaseCommand):
+    help = ('Наполняет базу пользователями, группами, постами, '
+            'комментариями и подписками для нагрузочных замеров.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=10000)
+        parser.add_argument('--images', type=float, default=0.0,
+                            help='Доля постов с картинкой, от 0 до 1.')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Размер пачки bulk_create.')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Зерно генератора случайных чисел.')
+        parser.add_argument('--alpha', type=float, default=1.2,
+                            help='Показатель степенного закона подписок.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней разбросать даты постов.')
+        parser.add_argument('--password', default=None,
+                            help='Общий пароль созданных пользователей.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+
+        def log(message):
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f'[{elapsed:7.1f} с] {message}')
+
+        seeding.seed(
+            users=options['users'], groups=options['groups'],
+            posts=options['posts'], comments=options['comments'],
+            follows=options['follows'], image_share=options['images'],
+            rng_seed=options['seed'], batch_size=options['batch_size'],
+            alpha=options['alpha'], days=options['days'],
+            password=options['password'], log=log,
+        )
+        self.stdout.write(self.style.SUCCESS('База наполнена.'))
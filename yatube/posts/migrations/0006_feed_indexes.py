@@ -0,0 +1,64 @@
+# Generated by Django 2.2.16 on 2026-10-18 04:18
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_follows(apps, schema_editor):
+    Follow = apps.get_model('posts', 'Follow')
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    SiteCounter = apps.get_model('posts', 'SiteCounter')
+    duplicates = (Follow.objects.values('user', 'author').order_by()
+                  .annotate(first=Min('id'), total=Count('id'))
+                  .filter(total__gt=1))
+    users = set()
+    for row in duplicates:
+        Follow.objects.filter(user=row['user'], author=row['author']).exclude(
+            id=row['first']).delete()
+        users.update((row['user'], row['author']))
+    if not users:
+        return
+    for stats in AuthorStats.objects.filter(user__in=users):
+        stats.followers_count = Follow.objects.filter(
+            author=stats.user_id).count()
+        stats.following_count = Follow.objects.filter(
+            user=stats.user_id).count()
+        stats.save()
+    SiteCounter.objects.filter(name='follows').update(
+        value=Follow.objects.count())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0005_thumbnails'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_follows,
+                             migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-created'], name='comment_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['author', 'user'], name='follow_author_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='post_author_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['group', '-pub_date', '-id'], name='post_group_date_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+        ),
+    ]
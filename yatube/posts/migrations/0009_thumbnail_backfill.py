@@ -0,0 +1,29 @@
+from django.db import migrations
+
+# posts.thumbnails.GEOMETRIES на момент миграции.
+GEOMETRIES = ('960x339', '960x400', '960x500')
+
+
+def enqueue_missing(apps, schema_editor):
+    """Задания на миниатюры картинок, загруженных до очереди миниатюр."""
+    Post = apps.get_model('posts', 'Post')
+    Thumbnail = apps.get_model('posts', 'Thumbnail')
+    existing = set(Thumbnail.objects.values_list('post_id', 'geometry'))
+    posts = (Post.objects.exclude(image='').exclude(image__isnull=True)
+             .values_list('id', 'image').iterator())
+    Thumbnail.objects.bulk_create(
+        (Thumbnail(post_id=post_id, geometry=geometry, source=image)
+         for post_id, image in posts for geometry in GEOMETRIES
+         if (post_id, geometry) not in existing),
+        batch_size=500, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0008_timeline_cursor_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(enqueue_missing, migrations.RunPython.noop),
+    ]
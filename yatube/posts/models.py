@@ -15,6 +15,30 @@ class Group(models.Model):
         return self.title
 
 
+class PostQuerySet(models.QuerySet):
+
+    # Поля, которые выводит карточка поста в лентах.
+    FEED_FIELDS = (
+        'id', 'text', 'pub_date', 'image', 'author', 'group',
+        'author__username', 'author__first_name', 'author__last_name',
+        'group__slug', 'group__title',
+    )
+
+    def for_feed(self, summary=False):
+        """
+        Посты для карточек лент: автор и группа читаются тем же
+        запросом, остальные столбцы не выбираются.
+
+        summary=True откладывает текст поста для списков, где выводится
+        только его фрагмент (поиск).
+        """
+        queryset = self.select_related('author', 'group').only(
+            *self.FEED_FIELDS)
+        if summary:
+            queryset = queryset.defer('text')
+        return queryset
+
+
 class Post(models.Model):
 
     text = models.TextField(
@@ -44,9 +68,24 @@ class Post(models.Model):
         null=True,
         help_text='Загрузите картинку'
     )
+    comments_count = models.PositiveIntegerField(
+        'Число комментариев',
+        default=0,
+        editable=False,
+    )
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
+        # Индексы повторяют порядок ключевой пагинации (-pub_date, -id).
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
@@ -74,6 +113,10 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', '-created', '-id'],
+                         name='comment_post_cursor_idx'),
+        ]
 
     def __str__(self):
         return self.text
@@ -94,3 +137,114 @@ class Follow(models.Model):
         related_name='following',
         verbose_name='Автор',
     )
+    pushed = models.BooleanField(
+        'Доставка постов в ленту при публикации',
+        default=True,
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'author'],
+                                    name='unique_follow'),
+        ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пользователь',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='Пост',
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ['-pub_date', '-post']
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_timeline_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='timeline_user_cursor_idx'),
+        ]
+
+
+class AuthorStats(models.Model):
+    """Счётчики автора, обновляемые при изменении постов и подписок."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='Пользователь',
+    )
+    posts_count = models.PositiveIntegerField('Число постов', default=0)
+    followers_count = models.PositiveIntegerField(
+        'Число подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Число подписок', default=0)
+
+
+class SiteCounter(models.Model):
+    """Общие счётчики сайта: пользователи, посты, подписки."""
+
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name}={self.value}'
+
+
+class Thumbnail(models.Model):
+    """Задание и результат подготовки миниатюры картинки поста."""
+
+    PENDING = 'pending'
+    READY = 'ready'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (READY, 'Готова'),
+        (FAILED, 'Ошибка'),
+    )
+
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='thumbnails',
+        verbose_name='Пост',
+    )
+    geometry = models.CharField('Размер', max_length=20)
+    source = models.CharField('Исходный файл', max_length=255)
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING)
+    url = models.CharField(max_length=255, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['post', 'geometry'],
+                                    name='unique_post_thumbnail'),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'created'],
+                         name='thumbnail_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post_id} {self.geometry} {self.status}'
@@ -0,0 +1,96 @@
+"""
+Кеш целых страниц лент для анонимных посетителей.
+
+Представление отмечает, от каких областей posts.feed_cache зависит
+страница (depends_on), и ответ сохраняется в кеше по пути и строке
+запроса вместе с версиями этих областей на момент отрисовки. Запись
+отдаётся, только пока версии не сдвинулись, поэтому сигналы об
+изменении постов, групп и подписок сбрасывают ровно те страницы,
+которые от них зависят: общую ленту, ленту группы или автора.
+
+Кеш обходится для запросов не GET/HEAD и для запросов с cookie сессии:
+такой посетитель может быть авторизован, а проверка сессии стоила бы
+запроса к базе. Не сохраняются ответы, которые ставят cookie или
+выводят форму с CSRF-токеном.
+"""
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.urls import resolve
+from django.utils.cache import get_conditional_response
+from django.utils.encoding import force_bytes
+
+from core import metrics, routers
+from posts import feed_cache
+
+PAGE_PREFIX = 'page'
+
+REQUESTS = metrics.Counter('yatube_page_cache_requests_total',
+                           'Обращения к кешу страниц.', ('result',))
+
+
+def timeout() -> int:
+    return getattr(settings, 'PAGE_CACHE_TIMEOUT', 60 * 60)
+
+
+def depends_on(request, *scopes) -> None:
+    """
+    Отмечает области, от которых зависит страница.
+
+    Версии запоминаются до выборки ленты: сдвиг во время отрисовки
+    сделает запись устаревшей, а не спрячет изменение.
+    """
+    scopes = ['all', *scopes]
+    request.page_scopes = scopes
+    request.page_versions = feed_cache.versions(scopes)
+
+
+def page_key(request) -> str:
+    digest = md5(force_bytes(request.get_full_path())).hexdigest()
+    return f'{PAGE_PREFIX}:{digest}'
+
+
+class PageCacheMiddleware:
+    """Отдаёт анонимным посетителям сохранённые страницы лент."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def bypass(self, request) -> bool:
+        return (request.method not in ('GET', 'HEAD')
+                or settings.SESSION_COOKIE_NAME in request.COOKIES
+                or not timeout())
+
+    def cacheable(self, request, response) -> bool:
+        return (getattr(request, 'page_scopes', None) is not None
+                and response.status_code == 200
+                and not response.streaming
+                and not response.cookies
+                and not request.META.get('CSRF_COOKIE_USED'))
+
+    def __call__(self, request):
+        if self.bypass(request):
+            REQUESTS.inc(result='bypass')
+            return self.get_response(request)
+        key = page_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            scopes, versions, response = entry
+            if feed_cache.versions(scopes) == versions:
+                REQUESTS.inc(result='hit')
+                # Метрики подписывают запросы именем URL.
+                request.resolver_match = resolve(request.path_info)
+                return get_conditional_response(
+                    request, etag=response.get('ETag'), response=response)
+        REQUESTS.inc(result='miss')
+        response = self.get_response(request)
+        if self.cacheable(request, response):
+            ttl = timeout()
+            if routers.used_replica():
+                # Как и фрагменты: отставшая реплика не должна
+                # закрепить старую страницу под новыми версиями.
+                ttl = min(ttl, routers.pin_seconds())
+            cache.set(key, (request.page_scopes, request.page_versions,
+                            response), ttl)
+        return response
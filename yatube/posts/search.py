@@ -0,0 +1,190 @@
+"""
+Полнотекстовый поиск по постам.
+
+Бэкенд выбирается настройкой POSTS_SEARCH_BACKEND. По умолчанию
+используется индекс SQLite FTS5 (таблица posts_post_fts, rowid = id
+поста), который обновляется сигналами при сохранении и удалении
+постов. На других СУБД таблицы FTS нет, и get_backend() вместо него
+отдаёт простой бэкенд на icontains.
+
+Результаты ранжируются и выдаются постранично по ключу (ранг, id):
+курсор следующей страницы — ключ последнего результата.
+"""
+import base64
+import binascii
+import json
+import re
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection
+from django.utils.html import escape
+from django.utils.module_loading import import_string
+
+from posts.models import Post
+
+FTS_TABLE = 'posts_post_fts'
+MARK_START = '\x02'
+MARK_END = '\x03'
+SNIPPET_TOKENS = 16
+WORD_RE = re.compile(r'\w+')
+
+
+@dataclass
+class SearchPage:
+    """Страница результатов: посты с рангом и фрагментом текста."""
+
+    posts: list = field(default_factory=list)
+    next_cursor: str = None
+
+
+def terms(query: str) -> list:
+    """Слова запроса без операторов и спецсимволов."""
+    return WORD_RE.findall(query.lower())
+
+
+def encode_cursor(rank: float, post_id: int) -> str:
+    raw = json.dumps([repr(rank), post_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    if not cursor:
+        return None
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        rank, post_id = json.loads(base64.urlsafe_b64decode(padded))
+        return float(rank), int(post_id)
+    except (binascii.Error, ValueError, TypeError):
+        return None
+
+
+def highlight(snippet: str) -> str:
+    """Экранирует фрагмент и подсвечивает найденные слова."""
+    return (escape(snippet)
+            .replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+class SearchBackend:
+    """Интерфейс бэкенда поиска."""
+
+    # СУБД, на которых работает бэкенд; None — на любых.
+    vendors = None
+
+    def index(self, post: Post) -> None:
+        raise NotImplementedError
+
+    def remove(self, post_id: int) -> None:
+        raise NotImplementedError
+
+    def rebuild(self) -> None:
+        raise NotImplementedError
+
+    def hits(self, words, after, limit) -> list:
+        """Список (rank, post_id, snippet) в порядке (rank, -post_id)."""
+        raise NotImplementedError
+
+    def search(self, query: str, cursor=None, limit=10) -> SearchPage:
+        words = terms(query)
+        if not words:
+            return SearchPage()
+        rows = self.hits(words, decode_cursor(cursor), limit + 1)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1][0], rows[-1][1])
+        posts = Post.objects.for_feed(summary=True).in_bulk(
+            [post_id for _, post_id, _ in rows])
+        page = SearchPage(next_cursor=next_cursor)
+        for rank, post_id, snippet in rows:
+            post = posts.get(post_id)
+            if post is None:
+                continue
+            post.rank = rank
+            post.snippet = highlight(snippet)
+            page.posts.append(post)
+        return page
+
+
+class SQLiteFTSBackend(SearchBackend):
+    """Инвертированный индекс SQLite FTS5."""
+
+    vendors = ('sqlite',)
+
+    def index(self, post: Post) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)',
+                [post.id, post.text])
+
+    def remove(self, post_id: int) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+
+    def rebuild(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(f'INSERT INTO {FTS_TABLE}(rowid, text) '
+                           f'SELECT id, text FROM {Post._meta.db_table}')
+
+    def hits(self, words, after, limit) -> list:
+        match = ' '.join(f'"{word}"' for word in words)
+        sql = (
+            f'SELECT score, rowid, snip FROM ('
+            f' SELECT rowid, bm25({FTS_TABLE}) AS score,'
+            f' snippet({FTS_TABLE}, 0, %s, %s, %s, %s) AS snip'
+            f' FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)'
+        )
+        params = [MARK_START, MARK_END, '…', SNIPPET_TOKENS, match]
+        if after is not None:
+            sql += ' WHERE score > %s OR (score = %s AND rowid < %s)'
+            params += [after[0], after[0], after[1]]
+        sql += ' ORDER BY score, rowid DESC LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+
+
+class SimpleSearchBackend(SearchBackend):
+    """Поиск без индекса: для СУБД без FTS5, все ранги равны."""
+
+    def index(self, post: Post) -> None:
+        pass
+
+    def remove(self, post_id: int) -> None:
+        pass
+
+    def rebuild(self) -> None:
+        pass
+
+    def hits(self, words, after, limit) -> list:
+        posts = Post.objects.order_by('-id')
+        for word in words:
+            posts = posts.filter(text__icontains=word)
+        if after is not None:
+            posts = posts.filter(id__lt=after[1])
+        return [(0.0, post_id, self._snippet(text, words[0]))
+                for post_id, text in posts.values_list('id', 'text')[:limit]]
+
+    @staticmethod
+    def _snippet(text: str, word: str, width: int = 80) -> str:
+        start = max(text.lower().find(word) - width // 2, 0)
+        fragment = text[start:start + width]
+        return re.sub(f'({re.escape(word)})', f'{MARK_START}\\1{MARK_END}',
+                      fragment, flags=re.IGNORECASE)
+
+
+def get_backend() -> SearchBackend:
+    """
+    Бэкенд из POSTS_SEARCH_BACKEND; если он не поддерживает СУБД
+    соединения, используется SimpleSearchBackend.
+    """
+    backend = import_string(getattr(settings, 'POSTS_SEARCH_BACKEND',
+                                    'posts.search.SQLiteFTSBackend'))
+    if backend.vendors and connection.vendor not in backend.vendors:
+        backend = SimpleSearchBackend
+    return backend()
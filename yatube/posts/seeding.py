@@ -0,0 +1,222 @@
+"""
+Генерация больших наборов данных для нагрузочных замеров.
+
+Строки создаются через bulk_create пачками, поэтому сигналы не
+срабатывают: после наполнения счётчики, ленты подписок и поисковый
+индекс пересобираются целиком. Подписки и авторство постов
+распределены по степенному закону — у немногих авторов большинство
+подписчиков и постов, как на живом сайте. При одинаковом зерне
+генератора получаются одинаковые данные.
+"""
+import io
+import itertools
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+
+from posts import counters, feed_cache, search, thumbnails, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = (
+    'лев', 'толстой', 'война', 'мир', 'утро', 'вечер', 'город', 'река',
+    'книга', 'письмо', 'дорога', 'лес', 'поле', 'море', 'дом', 'сад',
+    'солнце', 'дождь', 'зима', 'лето', 'друг', 'работа', 'музыка', 'кино',
+    'кот', 'собака', 'поезд', 'чай', 'кофе', 'осень', 'весна', 'снег',
+)
+IMAGE_COUNT = 8
+IMAGE_COLORS = ('#d9534f', '#5cb85c', '#5bc0de', '#f0ad4e', '#428bca',
+                '#6f42c1', '#20c997', '#343a40')
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Позволяет задать значения полям с auto_now_add при bulk_create."""
+    saved = [(field, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in saved:
+            field.auto_now_add = value
+
+
+def power_law_weights(count: int, alpha: float) -> list:
+    """Накопленные веса рангов 1..count с показателем alpha."""
+    return list(itertools.accumulate(
+        1 / rank ** alpha for rank in range(1, count + 1)))
+
+
+class Seeder:
+    """Наполняет базу пачками заданного размера."""
+
+    def __init__(self, rng_seed=0, batch_size=1000, alpha=1.2, days=365,
+                 password=None, log=None):
+        self.rng = random.Random(rng_seed)
+        self.batch_size = batch_size
+        self.alpha = alpha
+        self.days = days
+        self.password = make_password(password)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def bulk(self, model, objects) -> int:
+        """Сохраняет объекты пачками, не держа их все в памяти."""
+        created = 0
+        objects = iter(objects)
+        while True:
+            batch = list(itertools.islice(objects, self.batch_size))
+            if not batch:
+                break
+            with transaction.atomic():
+                # Размер одного INSERT выбирает бэкенд: в Django 2.2
+                # явный batch_size не ограничивается лимитами SQLite.
+                model.objects.bulk_create(batch)
+            created += len(batch)
+        self.log(f'{model.__name__}: {created}')
+        return created
+
+    def new_ids(self, model, start_id) -> list:
+        return list(model.objects.filter(id__gt=start_id).order_by('id')
+                    .values_list('id', flat=True))
+
+    def last_id(self, model) -> int:
+        return model.objects.order_by('-id').values_list(
+            'id', flat=True).first() or 0
+
+    def ranked(self, ids) -> tuple:
+        """Случайный порядок популярности и накопленные веса к нему."""
+        ids = list(ids)
+        self.rng.shuffle(ids)
+        return ids, power_law_weights(len(ids), self.alpha)
+
+    def text(self, low: int, high: int) -> str:
+        words = self.rng.choices(WORDS, k=self.rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def date(self):
+        return self.now - timedelta(
+            seconds=self.rng.randrange(self.days * 24 * 60 * 60))
+
+    def users(self, count: int) -> list:
+        start_id = self.last_id(User)
+        self.bulk(User, (
+            User(username=f'seed{start_id + i}', password=self.password,
+                 first_name=f'Имя{i}', last_name=f'Фамилия{i}')
+            for i in range(count)))
+        return self.new_ids(User, start_id)
+
+    def groups(self, count: int) -> list:
+        start_id = self.last_id(Group)
+        self.bulk(Group, (
+            Group(title=f'Группа {start_id + i}',
+                  slug=f'seed-{start_id + i}',
+                  description=self.text(5, 20))
+            for i in range(count)))
+        return self.new_ids(Group, start_id)
+
+    def images(self) -> list:
+        """Несколько картинок, общих для всех постов с изображением."""
+        from PIL import Image
+
+        names = []
+        for i, color in enumerate(IMAGE_COLORS[:IMAGE_COUNT]):
+            name = f'posts/seed-{i}.png'
+            if not default_storage.exists(name):
+                buffer = io.BytesIO()
+                Image.new('RGB', (1200, 800), color).save(buffer, 'PNG')
+                name = default_storage.save(name, ContentFile(
+                    buffer.getvalue()))
+            names.append(name)
+        return names
+
+    def posts(self, count: int, user_ids, group_ids, image_share=0.0) -> list:
+        start_id = self.last_id(Post)
+        authors, weights = self.ranked(user_ids)
+        images = self.images() if image_share else []
+        rng = self.rng
+
+        def rows():
+            for _ in range(count):
+                yield Post(
+                    author_id=rng.choices(authors, cum_weights=weights)[0],
+                    group_id=(rng.choice(group_ids)
+                              if group_ids and rng.random() < 0.5 else None),
+                    text=self.text(5, 60),
+                    image=(rng.choice(images)
+                           if images and rng.random() < image_share else ''),
+                    pub_date=self.date(),
+                )
+
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.bulk(Post, rows())
+        return self.new_ids(Post, start_id)
+
+    def comments(self, count: int, user_ids, post_ids) -> None:
+        rng = self.rng
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.bulk(Comment, (
+                Comment(post_id=rng.choice(post_ids),
+                        author_id=rng.choice(user_ids),
+                        text=self.text(2, 20), created=self.date())
+                for _ in range(count)))
+
+    def follows(self, count: int, user_ids) -> None:
+        """Подписки: читатель случаен, автор — по степенному закону."""
+        authors, weights = self.ranked(user_ids)
+        existing = set(Follow.objects.values_list('user_id', 'author_id'))
+        count = min(count,
+                    len(user_ids) * (len(user_ids) - 1) - len(existing))
+        rng = self.rng
+
+        def rows():
+            created = 0
+            while created < count:
+                batch = rng.choices(authors, cum_weights=weights,
+                                    k=self.batch_size)
+                for author_id in batch:
+                    pair = (rng.choice(user_ids), author_id)
+                    if pair[0] == author_id or pair in existing:
+                        continue
+                    existing.add(pair)
+                    yield Follow(user_id=pair[0], author_id=author_id)
+                    created += 1
+                    if created == count:
+                        return
+
+        self.bulk(Follow, rows())
+
+    def finish(self) -> None:
+        """Пересобирает производные данные, которые ведут сигналы."""
+        counters.recount()
+        self.log('Счётчики пересчитаны')
+        timeline.rebuild()
+        self.log('Ленты подписок пересобраны')
+        search.get_backend().rebuild()
+        self.log('Поисковый индекс пересобран')
+        queued = thumbnails.enqueue_missing(self.batch_size)
+        self.log(f'Заданий на миниатюры: {queued} '
+                 f'(выполняет process_thumbnails)')
+        feed_cache.bump('all')
+
+
+def seed(users=1000, groups=20, posts=3000, comments=3000, follows=3000,
+         image_share=0.0, rng_seed=0, batch_size=1000, alpha=1.2, days=365,
+         password=None, log=None) -> None:
+    """Наполняет базу данными, похожими на боевые."""
+    seeder = Seeder(rng_seed=rng_seed, batch_size=batch_size, alpha=alpha,
+                    days=days, password=password, log=log)
+    user_ids = seeder.users(users)
+    group_ids = seeder.groups(groups)
+    post_ids = seeder.posts(posts, user_ids, group_ids, image_share)
+    if post_ids and user_ids:
+        seeder.comments(comments, user_ids, post_ids)
+    if len(user_ids) > 1:
+        seeder.follows(follows, user_ids)
+    seeder.finish()
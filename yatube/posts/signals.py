@@ -0,0 +1,126 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from posts import counters, feed_cache, search, thumbnails, timeline
+from posts.models import Comment, Follow, Group, Post, User
+
+# Поля пользователя, которые выводятся в карточке поста.
+CARD_USER_FIELDS = {'username', 'first_name', 'last_name'}
+
+
+@receiver(pre_save, sender=Post)
+def post_remember_previous(sender, instance, **kwargs):
+    """
+    Запоминает прежние группу и картинку поста: ленту прежней группы
+    нужно сбросить, а для новой картинки нарезать миниатюры.
+    """
+    instance._old_group_id = None
+    instance._old_image = ''
+    if not instance._state.adding:
+        instance._old_group_id, instance._old_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group_id', 'image').first() or (None, ''))
+
+
+@receiver(post_save, sender=Post)
+def post_fan_out(sender, instance, created, **kwargs):
+    """Раскладывает новый пост в ленты подписчиков."""
+    if created:
+        counters.bump_total('posts', 1)
+        counters.bump_author(instance.author_id, 'posts_count', 1)
+        timeline.fan_out(instance)
+    feed_cache.bump_post(instance, [getattr(instance, '_old_group_id', None)])
+    search.get_backend().index(instance)
+    if instance.image.name != getattr(instance, '_old_image', ''):
+        thumbnails.schedule(instance)
+
+
+@receiver(post_delete, sender=Post)
+def post_uncount(sender, instance, **kwargs):
+    counters.bump_total('posts', -1)
+    counters.bump_author(instance.author_id, 'posts_count', -1)
+    feed_cache.bump_post(instance)
+    search.get_backend().remove(instance.id)
+
+
+@receiver(pre_save, sender=Follow)
+def follow_delivery_mode(sender, instance, **kwargs):
+    """Подписка на «тяжёлого» автора читается без раскладки."""
+    if instance._state.adding:
+        instance.pushed = not timeline.is_heavy_author(instance.author_id)
+
+
+@receiver(post_save, sender=Follow)
+def follow_backfill(sender, instance, created, **kwargs):
+    """Заполняет ленту постами автора при подписке."""
+    if created:
+        counters.bump_total('follows', 1)
+        counters.bump_author(instance.author_id, 'followers_count', 1)
+        counters.bump_author(instance.user_id, 'following_count', 1)
+        timeline.backfill(instance)
+        feed_cache.bump('totals')
+    feed_cache.bump(f'follow:{instance.user_id}')
+
+
+@receiver(post_delete, sender=Follow)
+def follow_trim(sender, instance, **kwargs):
+    """Чистит ленту при отписке."""
+    counters.bump_total('follows', -1)
+    counters.bump_author(instance.author_id, 'followers_count', -1)
+    counters.bump_author(instance.user_id, 'following_count', -1)
+    timeline.trim(instance)
+    feed_cache.bump('totals', f'follow:{instance.user_id}')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    """Название группы выводится в карточках всех лент."""
+    feed_cache.bump('all', f'group-card:{instance.id}')
+
+
+@receiver(post_save, sender=Comment)
+def comment_count(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_uncount(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+
+
+@receiver(pre_save, sender=User)
+def user_remember_previous(sender, instance, update_fields=None, **kwargs):
+    """
+    Запоминает поля пользователя из карточек постов, чтобы сбросить
+    карточки и ленты только при их настоящем изменении.
+    """
+    instance._old_card_fields = None
+    if instance._state.adding:
+        return
+    if update_fields and not CARD_USER_FIELDS & set(update_fields):
+        # Например, last_login при каждом входе.
+        return
+    instance._old_card_fields = (User.objects.filter(pk=instance.pk)
+                                 .values(*CARD_USER_FIELDS).first())
+
+
+@receiver(post_save, sender=User)
+def user_count(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_total('users', 1)
+        feed_cache.bump('totals')
+        return
+    previous = getattr(instance, '_old_card_fields', None)
+    if previous is None or all(getattr(instance, field) == value
+                               for field, value in previous.items()):
+        return
+    # Имя автора выводится в карточках его постов во всех лентах.
+    feed_cache.bump('all', f'author:{instance.id}')
+
+
+@receiver(post_delete, sender=User)
+def user_uncount(sender, instance, **kwargs):
+    counters.bump_total('users', -1)
+    feed_cache.bump('totals')
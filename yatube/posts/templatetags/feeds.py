@@ -0,0 +1,45 @@
+from django import template
+
+from posts import cards, feed_cache
+
+register = template.Library()
+
+
+class FeedCacheNode(template.Node):
+
+    def __init__(self, nodelist, key):
+        self.nodelist = nodelist
+        self.key = key
+
+    def render(self, context):
+        key = self.key.resolve(context)
+        if not key:
+            return self.nodelist.render(context)
+        return feed_cache.fragment(key,
+                                   lambda: self.nodelist.render(context))
+
+
+@register.tag
+def feedcache(parser, token):
+    """
+    Кеширует фрагмент ленты по ключу из posts.feed_cache.fragment_key.
+
+    {% feedcache feed_key %} ... {% endfeedcache %}
+    """
+    bits = token.split_contents()
+    if len(bits) != 2:
+        raise template.TemplateSyntaxError(
+            f"'{bits[0]}' tag requires exactly one argument.")
+    nodelist = parser.parse(('endfeedcache',))
+    parser.delete_first_token()
+    return FeedCacheNode(nodelist, parser.compile_filter(bits[1]))
+
+
+@register.filter
+def post_cards(posts, geometry):
+    """
+    Карточки страницы постов, нарисованные за один проход (posts.cards).
+
+    {% for card in page_obj|post_cards:"960x339" %}{{ card }}{% endfor %}
+    """
+    return cards.render_cards(posts, geometry)
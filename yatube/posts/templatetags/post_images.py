@@ -0,0 +1,15 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_thumbnail_url(post, geometry):
+    """
+    Адрес готовой миниатюры картинки поста или пустая строка.
+
+    {% post_thumbnail_url post "960x339" as thumb_url %}
+    """
+    return thumbnails.thumbnail_url(post, geometry)
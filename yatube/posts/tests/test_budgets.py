@@ -0,0 +1,80 @@
+import os
+from io import StringIO
+from unittest import skipUnless
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase
+
+from posts import benchmarks, seeding
+
+
+class ViewBudgetTest(TestCase):
+    """
+    Бюджеты SQL-запросов и планы выборок представлений лент.
+
+    Число запросов и планы не зависят от объёма данных, поэтому база
+    наполняется немного. С переменной окружения YATUBE_BENCH_REPORT=1
+    печатает таблицу замеров.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed(users=50, groups=5, posts=200, comments=200,
+                     follows=200)
+
+    def test_views_within_query_budget(self):
+        """Представления укладываются в бюджеты запросов."""
+        measurements = benchmarks.run(runs=1)
+        if os.environ.get('YATUBE_BENCH_REPORT'):
+            print('\n' + benchmarks.format_table(measurements))
+        for item in measurements:
+            budget = benchmarks.BUDGETS[item.view]
+            with self.subTest(view=item.view):
+                self.assertLessEqual(item.cold_queries, budget['cold'])
+                self.assertLessEqual(item.warm_queries, budget['warm'])
+
+    def test_feed_queries_use_indexes(self):
+        """Выборки лент и комментариев не сортируются во временном дереве."""
+        view_plans = benchmarks.plans()
+        if os.environ.get('YATUBE_BENCH_REPORT'):
+            print('\n' + benchmarks.format_plans(view_plans))
+        for view, queries in view_plans.items():
+            for sql, plan in queries:
+                with self.subTest(view=view, sql=sql[:60]):
+                    self.assertFalse(
+                        any('TEMP B-TREE' in step for step in plan), plan)
+
+
+class EmptyDatabaseBenchmarkTest(TestCase):
+
+    def test_benchmark_requires_seeding(self):
+        """На пустой базе замер просит сначала наполнить её."""
+        with self.assertRaisesMessage(CommandError, 'seed_yatube'):
+            call_command('benchmark_views', runs=1, stdout=StringIO())
+
+
+@skipUnless(os.environ.get('YATUBE_BENCH'),
+            'замеры времени включаются переменной YATUBE_BENCH=1')
+class ViewLatencyTest(TestCase):
+    """
+    Пороги времени ответа на базе боевого объёма.
+
+    Замеры зависят от машины, поэтому в обычный прогон не входят;
+    те же цифры печатает ``manage.py benchmark_views --seed``.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        seeding.seed()
+
+    def test_views_within_latency_budget(self):
+        """Представления укладываются в пороги p50/p95."""
+        measurements = benchmarks.run(runs=10)
+        if os.environ.get('YATUBE_BENCH_REPORT'):
+            print('\n' + benchmarks.format_table(measurements))
+        for item in measurements:
+            budget = benchmarks.BUDGETS[item.view]
+            with self.subTest(view=item.view):
+                self.assertLessEqual(item.p50, budget['p50'])
+                self.assertLessEqual(item.p95, budget['p95'])
@@ -0,0 +1,181 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.template import Context, Template
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import cards, feed_cache, thumbnails
+from posts.models import Follow, Group, Post, Thumbnail
+
+User = get_user_model()
+
+
+class PostCardsTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем посты с группой, картинкой и без них."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='a.b+c@d-e_f',
+                                            first_name='Лев',
+                                            last_name='<Толстой>')
+        cls.group = Group.objects.create(title='Классика & Ко',
+                                         slug='classic', description='')
+        cls.plain = Post.objects.create(author=cls.user, text='Простой пост')
+        cls.grouped = Post.objects.create(author=cls.user, group=cls.group,
+                                          text='<script>alert(1)</script>')
+        cls.pictured = Post.objects.create(author=cls.user, text='С фото',
+                                           image='posts/photo.png')
+
+    def setUp(self):
+        cache.clear()
+
+    def feed(self):
+        return list(Post.objects.for_feed().order_by('id'))
+
+    def test_url_matches_reverse(self):
+        """Адрес из шаблона совпадает с reverse() и для особых имён."""
+        for name, arg in (('posts:profile', self.user.username),
+                          ('posts:profile', 'пользователь'),
+                          ('posts:group_list', self.group.slug),
+                          ('posts:post_detail', self.plain.id)):
+            with self.subTest(name=name, arg=arg):
+                self.assertEqual(cards.url(name, arg),
+                                 reverse(name, args=[arg]))
+
+    def test_cards_markup(self):
+        """Карточки содержат ссылки, экранированный текст и группу."""
+        rendered = cards.render_cards(self.feed(), '960x339')
+        self.assertEqual(len(rendered), 3)
+        html = ''.join(rendered)
+        self.assertIn(reverse('posts:profile', args=[self.user.username]),
+                      html)
+        self.assertIn('<b>Лев &lt;Толстой&gt;</b>', html)
+        self.assertIn('&lt;script&gt;', html)
+        self.assertNotIn('<script>', html)
+        self.assertEqual(html.count(
+            reverse('posts:group_list', args=[self.group.slug])), 1)
+        self.assertIn('все записи группы Классика &amp; Ко', html)
+        for post in (self.plain, self.grouped, self.pictured):
+            self.assertIn(f'подробности поста № {post.id}', html)
+        self.assertIn('Изображение обрабатывается', html)
+
+    def test_ready_thumbnail_read_in_one_cache_call(self):
+        """Готовые миниатюры страницы берутся из кеша без базы."""
+        posts = self.feed()
+        key = thumbnails._cache_key(self.pictured.id, '960x339',
+                                    self.pictured.image.name)
+        cache.set(key, '/media/cache/thumb.jpg', None)
+        with self.assertNumQueries(0):
+            html = ''.join(cards.render_cards(posts, '960x339'))
+        self.assertIn('<img class="card-img my-2" '
+                      'src="/media/cache/thumb.jpg">', html)
+        self.assertNotIn('Изображение обрабатывается', html)
+
+    def test_template_filter(self):
+        """Фильтр post_cards отдаёт карточки без повторного экранирования."""
+        posts = self.feed()
+        rendered = Template(
+            '{% load feeds %}{% for card in posts|post_cards:"960x400" %}'
+            '{{ card }}{% endfor %}'
+        ).render(Context({'posts': posts}))
+        self.assertEqual(rendered,
+                         ''.join(cards.render_cards(posts, '960x400')))
+
+    def rerendered(self):
+        """id постов, карточки которых пришлось нарисовать заново."""
+        with mock.patch.object(cards, '_render',
+                               wraps=cards._render) as render:
+            cards.render_cards(self.feed(), '960x339')
+        return {post.id for call in render.call_args_list
+                for post in call[0][0]}
+
+    def test_cached_cards_are_not_rerendered(self):
+        """Вторая страница собирается из кеша без отрисовки и базы."""
+        self.assertEqual(len(self.rerendered()), 3)
+        posts = self.feed()
+        with self.assertNumQueries(0):
+            with mock.patch.object(cards, '_render') as render:
+                cached = cards.render_cards(posts, '960x339')
+        render.assert_not_called()
+        self.assertEqual(len(cached), 3)
+        self.assertIn('Простой пост', cached[0])
+
+    def test_post_edit_rerenders_its_card(self):
+        """Правка поста сбрасывает только его карточку."""
+        self.rerendered()
+        post = Post.objects.get(id=self.plain.id)
+        post.text = 'Исправленный пост'
+        post.save()
+        self.assertEqual(self.rerendered(), {self.plain.id})
+        self.assertIn('Исправленный пост',
+                      ''.join(cards.render_cards(self.feed(), '960x339')))
+
+    def test_author_and_group_changes_rerender_cards(self):
+        """Смена имени автора и группы сбрасывает их карточки."""
+        self.rerendered()
+        self.group.title = 'Новая классика'
+        self.group.save()
+        self.assertEqual(self.rerendered(), {self.grouped.id})
+        self.user.first_name = 'Лев Николаевич'
+        self.user.save()
+        self.assertEqual(self.rerendered(),
+                         {self.plain.id, self.grouped.id, self.pictured.id})
+
+    def test_login_keeps_cards(self):
+        """Вход автора (last_login) не сбрасывает карточки и ленты."""
+        self.rerendered()
+        before = feed_cache.versions(['all', f'author:{self.user.id}'])
+        self.client.force_login(self.user)
+        self.assertEqual(
+            feed_cache.versions(['all', f'author:{self.user.id}']), before)
+        self.assertEqual(self.rerendered(), set())
+
+    def test_unchanged_author_save_keeps_cards(self):
+        """Полное сохранение автора без смены имени не сбрасывает карточки."""
+        self.rerendered()
+        scopes = ['all', f'author:{self.user.id}']
+        before = feed_cache.versions(scopes)
+        user = User.objects.get(id=self.user.id)
+        user.email = 'lev@example.com'
+        user.save()
+        self.assertEqual(feed_cache.versions(scopes), before)
+        self.assertEqual(self.rerendered(), set())
+
+    def test_post_bumps_follower_feeds_in_one_write(self):
+        """Версии лент подписчиков сдвигаются одной записью в кеш."""
+        followers = [User.objects.create_user(username=f'fan_{i}')
+                     for i in range(3)]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.user)
+        scopes = [f'follow:{follower.id}' for follower in followers]
+        before = feed_cache.versions(scopes)
+        with mock.patch.object(cache, 'incr') as incr:
+            with mock.patch.object(cache, 'set_many',
+                                   wraps=cache.set_many) as set_many:
+                feed_cache.bump_post(self.plain)
+        incr.assert_not_called()
+        set_many.assert_called_once()
+        self.assertTrue(all(
+            old != new
+            for old, new in zip(before, feed_cache.versions(scopes))))
+
+    def test_missing_thumbnails_read_in_one_query(self):
+        """Миниатюры, которых нет в кеше, читаются из базы одним запросом."""
+        second = Post.objects.create(author=self.user, text='Ещё фото',
+                                     image='posts/other.png')
+        for post in (self.pictured, second):
+            Thumbnail.objects.update_or_create(
+                post=post, geometry='960x339',
+                defaults={'source': post.image.name, 'url': f'/t/{post.id}',
+                          'status': Thumbnail.READY})
+        cache.clear()
+        posts = self.feed()
+        with self.assertNumQueries(1):
+            urls = thumbnails.thumbnail_urls(posts, '960x339')
+        self.assertEqual(urls, {self.pictured.id: f'/t/{self.pictured.id}',
+                                second.id: f'/t/{second.id}'})
+        with self.assertNumQueries(0):
+            thumbnails.thumbnail_urls(posts, '960x339')
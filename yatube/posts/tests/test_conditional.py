@@ -0,0 +1,109 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Comment, Group, Post, User
+
+
+class ConditionalGetTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора, группу и пост."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(title='group', slug='group',
+                                         description='description')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Текст поста')
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': cls.group.slug}),
+            reverse('posts:profile', kwargs={'username': cls.user.username}),
+            reverse('posts:post_detail', kwargs={'post_id': cls.post.id}),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def revalidate(self, url, client=None):
+        client = client or self.client
+        etag = client.get(url)['ETag']
+        return client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_modified(self):
+        """Совпавший ETag получает 304 без тела."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                response = self.revalidate(url)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.content, b'')
+
+    def test_index_not_modified_without_queries(self):
+        """304 для главной не обращается к базе."""
+        etag = self.client.get(self.urls[0])['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.urls[0], HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_edit_changes_etag(self):
+        """Правка поста меняет ETag всех страниц, где он выводится."""
+        etags = [self.client.get(url)['ETag'] for url in self.urls]
+        self.post.text = 'Новый текст'
+        self.post.save()
+        for url, etag in zip(self.urls, etags):
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertContains(response, 'Новый текст')
+
+    def test_comment_changes_post_etag(self):
+        """Новый комментарий меняет ETag страницы поста."""
+        url = self.urls[3]
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.post, author=self.user,
+                               text='Комментарий')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Комментарий')
+
+    def test_etag_depends_on_user(self):
+        """Гость и пользователь получают разные ETag."""
+        author_client = Client()
+        author_client.force_login(self.user)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertNotEqual(self.client.get(url)['ETag'],
+                                    author_client.get(url)['ETag'])
+
+    def test_relogin_changes_etag(self):
+        """После повторного входа страница поста приходит с новым токеном."""
+        self.user.set_password('Sl0zhny-parol')
+        self.user.save()
+        login = reverse('users:login')
+        credentials = {'username': self.user.username,
+                       'password': 'Sl0zhny-parol'}
+        self.client.get(login)
+        self.client.post(login, credentials)
+        url = self.urls[3]
+        etag = self.client.get(url)['ETag']
+        self.assertEqual(
+            self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.client.get(reverse('users:logout'))
+        self.client.get(login)
+        self.client.post(login, credentials)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_missing_objects_still_404(self):
+        """Для несуществующих объектов ETag не считается."""
+        urls = (
+            reverse('posts:group_list', kwargs={'slug': 'missing'}),
+            reverse('posts:profile', kwargs={'username': 'missing'}),
+            reverse('posts:post_detail', kwargs={'post_id': 0}),
+        )
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts import counters
+from posts.models import AuthorStats, Comment, Follow, Post, SiteCounter
+
+User = get_user_model()
+
+
+class CountersTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора и читателя."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+
+    def test_counters_follow_creates_and_deletes(self):
+        """Счётчики сдвигаются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        Comment.objects.create(post=post, author=self.reader, text='Ура')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(counters.total('users'), 2)
+        self.assertEqual(counters.total('posts'), 1)
+        self.assertEqual(counters.total('follows'), 1)
+        stats = counters.author_stats(self.author.id)
+        self.assertEqual(stats.posts_count, 1)
+        self.assertEqual(stats.followers_count, 1)
+        self.assertEqual(
+            counters.author_stats(self.reader.id).following_count, 1)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+
+        follow.delete()
+        post.delete()
+        self.assertEqual(counters.total('posts'), 0)
+        self.assertEqual(counters.total('follows'), 0)
+        stats = counters.author_stats(self.author.id)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+
+    def test_recount_repairs_drift(self):
+        """Команда recount_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(3))
+        Comment.objects.bulk_create(
+            Comment(post=post, author=self.reader, text=f'Комментарий {i}')
+            for i in range(2))
+        SiteCounter.objects.filter(name='users').update(value=100)
+        call_command('recount_counters', stdout=open('/dev/null', 'w'))
+        self.assertEqual(counters.total('users'), 2)
+        self.assertEqual(counters.total('posts'), 4)
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 4)
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 2)
+
+    def test_drifted_counters_stay_non_negative(self):
+        """Уменьшение разошедшегося счётчика останавливается на нуле."""
+        post = Post.objects.create(author=self.author, text='Текст')
+        comment = Comment.objects.create(post=post, author=self.reader,
+                                         text='Ура')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        AuthorStats.objects.update(posts_count=0, followers_count=0,
+                                   following_count=0)
+        Post.objects.filter(id=post.id).update(comments_count=0)
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 0)
+        post.delete()
+        stats = counters.author_stats(self.author.id)
+        self.assertEqual(stats.posts_count, 0)
+        self.assertEqual(stats.followers_count, 0)
+        self.assertEqual(
+            counters.author_stats(self.reader.id).following_count, 0)
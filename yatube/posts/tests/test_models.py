@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-from posts.models import Group, Post
+from posts.models import Follow, Group, Post
 
 User = get_user_model()
 
@@ -38,3 +39,27 @@ class PostModelTest(TestCase):
         self.assertEqual(verb_name_av, 'Автор')
         self.assertEqual(verb_name_gr, 'Группа')
         self.assertEqual(help_text, 'Выберите группу')
+
+    def test_follow_is_unique(self):
+        """ Повторная подписка на автора запрещена на уровне базы."""
+        reader = User.objects.create(username='reader')
+        Follow.objects.create(user=reader, author=self.user)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Follow.objects.create(user=reader, author=self.user)
+
+    def test_for_feed_loads_card_in_one_query(self):
+        """ for_feed читает автора и группу карточки одним запросом."""
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Пост в группе')
+        with self.assertNumQueries(1):
+            for post in Post.objects.for_feed():
+                post.author.get_full_name()
+                post.author.username
+                post.text
+                if post.group:
+                    post.group.slug
+        post = Post.objects.for_feed().first()
+        self.assertNotIn('text', post.get_deferred_fields())
+        self.assertIn('password', post.author.get_deferred_fields())
+        post = Post.objects.for_feed(summary=True).first()
+        self.assertIn('text', post.get_deferred_fields())
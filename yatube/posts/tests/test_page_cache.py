@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import Follow, Group, Post, User
+
+
+class PageCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем авторов, две группы и посты."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='group', slug='group',
+                                         description='description')
+        cls.other_group = Group.objects.create(title='other', slug='other',
+                                               description='description')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Текст поста')
+        cls.index = reverse('posts:index')
+        cls.group_url = reverse('posts:group_list',
+                                kwargs={'slug': cls.group.slug})
+        cls.profile = reverse('posts:profile',
+                              kwargs={'username': cls.user.username})
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+
+    def test_anonymous_pages_cached(self):
+        """Повторный анонимный запрос ленты не обращается к базе."""
+        for url in (self.index, self.group_url, self.profile,
+                    f'{self.index}?page=1'):
+            with self.subTest(url=url):
+                content = self.client.get(url).content
+                with self.assertNumQueries(0):
+                    response = self.client.get(url)
+                self.assertEqual(response.content, content)
+
+    def test_hit_answers_conditional_get(self):
+        """Сохранённая страница отвечает 304 на совпавший ETag."""
+        etag = self.client.get(self.index)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(self.index, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_post_change_purges_its_scopes(self):
+        """Новый пост сбрасывает общую ленту, ленту группы и автора."""
+        for url in (self.index, self.group_url, self.profile):
+            self.client.get(url)
+        Post.objects.create(author=self.user, group=self.group,
+                            text='Свежий пост')
+        for url in (self.index, self.group_url, self.profile):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_other_scopes_stay_cached(self):
+        """Пост в другой группе не сбрасывает чужую ленту группы."""
+        self.client.get(self.group_url)
+        Post.objects.create(author=self.other, group=self.other_group,
+                            text='Чужой пост')
+        with self.assertNumQueries(0):
+            self.client.get(self.group_url)
+
+    def test_follow_purges_index_counters(self):
+        """Новая подписка меняет счётчик на главной."""
+        self.client.get(self.index)
+        Follow.objects.create(user=self.other, author=self.user)
+        response = self.client.get(self.index)
+        self.assertEqual(response.context['favt'], 1)
+
+    def test_session_cookie_bypasses_cache(self):
+        """Посетитель с сессией всегда получает свежую страницу."""
+        client = Client()
+        client.force_login(self.user)
+        client.get(self.index)
+        response = client.get(self.index)
+        self.assertIsNotNone(response.context)
+
+    def test_post_detail_not_cached(self):
+        """Страница поста в кеш страниц не попадает."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        self.client.get(url)
+        self.assertIsNotNone(self.client.get(url).context)
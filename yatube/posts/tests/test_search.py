@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts import search
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchViewTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем посты для поиска."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.posts = [
+            Post.objects.create(author=cls.user,
+                                text=f'Пост номер {i} про <котов>')
+            for i in range(12)
+        ]
+        cls.other = Post.objects.create(author=cls.user, text='Про собак')
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def search(self, **params):
+        return self.guest_client.get(reverse('posts:search'), params)
+
+    def test_search_ranks_and_paginates(self):
+        """Поиск находит посты, листает по курсору и экранирует текст."""
+        response = self.search(q='котов')
+        results = response.context['results']
+        self.assertEqual(len(results.posts), 10)
+        self.assertIn('<mark>котов</mark>', results.posts[0].snippet)
+        self.assertIn('&lt;', results.posts[0].snippet)
+        response = self.search(q='котов', cursor=results.next_cursor)
+        second = response.context['results']
+        self.assertEqual(len(second.posts), 2)
+        self.assertIsNone(second.next_cursor)
+        found = {post.id for post in results.posts + second.posts}
+        self.assertEqual(found, {post.id for post in self.posts})
+
+    def test_index_follows_edits_and_deletes(self):
+        """Индекс обновляется при правке и удалении поста."""
+        post = Post.objects.get(id=self.other.id)
+        post.text = 'Про хомяков'
+        post.save()
+        self.assertEqual(self.search(q='собак').context['results'].posts, [])
+        self.assertEqual(
+            [post.id for post in self.search(q='хомяков')
+             .context['results'].posts], [post.id])
+        post.delete()
+        self.assertEqual(self.search(q='хомяков').context['results'].posts,
+                         [])
+
+    def test_query_operators_are_ignored(self):
+        """Операторы FTS в запросе ищутся как обычные слова."""
+        response = self.search(q='котов" *(')
+        self.assertEqual(response.status_code, 200)
+        results = response.context['results']
+        self.assertEqual(len(results.posts), 10)
+        self.assertTrue(all('котов' in post.text for post in results.posts))
+        # OR — слово, а не оператор: поста со всеми тремя словами нет.
+        results = self.search(q='котов OR собак').context['results']
+        self.assertEqual(results.posts, [])
+
+    def test_fts_falls_back_on_other_databases(self):
+        """На СУБД без FTS5 используется простой бэкенд."""
+        self.assertIsInstance(search.get_backend(), search.SQLiteFTSBackend)
+        with mock.patch.object(connection, 'vendor', 'postgresql'):
+            backend = search.get_backend()
+        self.assertIsInstance(backend, search.SimpleSearchBackend)
+
+    @override_settings(POSTS_SEARCH_BACKEND='posts.search.SimpleSearchBackend')
+    def test_simple_backend(self):
+        """Простой бэкенд ищет без индекса."""
+        results = self.search(q='собак').context['results']
+        self.assertEqual([post.id for post in results.posts], [self.other.id])
@@ -0,0 +1,70 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count, F
+from django.test import TestCase, override_settings
+
+from posts import counters
+from posts.models import (AuthorStats, Comment, Follow, Group, Post,
+                          Thumbnail, TimelineEntry, User)
+from posts.thumbnails import GEOMETRIES
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class SeedCommandTest(TestCase):
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def seed(self, **options):
+        options = {'users': 50, 'groups': 3, 'posts': 200, 'comments': 100,
+                   'follows': 300, 'batch_size': 64, **options}
+        call_command('seed_yatube', stdout=StringIO(), **options)
+
+    def test_seed_creates_requested_rows(self):
+        """seed_yatube создаёт заданное число строк и производные данные."""
+        self.seed(images=0.5)
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Group.objects.count(), 3)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertEqual(Follow.objects.count(), 300)
+        self.assertFalse(
+            Follow.objects.filter(user=F('author')).exists())
+        self.assertEqual(counters.total('posts'), 200)
+        self.assertEqual(AuthorStats.objects.count(), 50)
+        self.assertTrue(TimelineEntry.objects.exists())
+        self.assertTrue(Post.objects.exclude(image='').exists())
+        self.assertEqual(
+            Thumbnail.objects.count(),
+            Post.objects.exclude(image='').count() * len(GEOMETRIES))
+        self.assertGreater(
+            Post.objects.values('pub_date').distinct().count(), 1)
+
+    def test_seed_follows_follow_power_law(self):
+        """Подписчики сосредоточены у немногих авторов."""
+        self.seed()
+        followers = list(Follow.objects.values('author').order_by()
+                         .annotate(total=Count('id'))
+                         .order_by('-total').values_list('total', flat=True))
+        self.assertGreater(sum(followers[:5]), sum(followers) / 4)
+
+    def test_seed_is_reproducible(self):
+        """При одинаковом зерне получаются одинаковые данные."""
+        self.seed(seed=7)
+        first = list(Post.objects.order_by('id').values_list('text',
+                                                             flat=True))
+        Post.objects.all().delete()
+        User.objects.all().delete()
+        Group.objects.all().delete()
+        self.seed(seed=7)
+        second = list(Post.objects.order_by('id').values_list('text',
+                                                              flat=True))
+        self.assertEqual(first, second)
@@ -0,0 +1,114 @@
+import os
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts import thumbnails
+from posts.models import Post, Thumbnail
+
+User = get_user_model()
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.author_client = Client()
+        self.author_client.force_login(self.user)
+
+    @staticmethod
+    def image_file(name='image.png'):
+        file_obj = BytesIO()
+        image = Image.new('RGB', size=(50, 50), color=(255, 0, 0))
+        image.save(file_obj, 'png')
+        return SimpleUploadedFile(name, file_obj.getvalue(),
+                                  content_type='image/png')
+
+    def test_create_queues_jobs_and_shows_placeholder(self):
+        """Создание поста ставит задания, до готовности видна заглушка."""
+        self.author_client.post(reverse('posts:post_create'), {
+            'text': 'Пост с картинкой', 'image': self.image_file()})
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(
+            set(post.thumbnails.values_list('geometry', 'status')),
+            {(geometry, Thumbnail.PENDING)
+             for geometry in thumbnails.GEOMETRIES})
+        url = reverse('posts:post_detail', args=[post.id])
+        self.assertContains(self.author_client.get(url),
+                            'Изображение обрабатывается')
+
+        self.assertEqual(thumbnails.process_pending(), 3)
+        ready = post.thumbnails.get(geometry='960x500')
+        self.assertEqual(ready.status, Thumbnail.READY)
+        response = self.author_client.get(url)
+        self.assertContains(response, ready.url)
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_saved_post_is_queued_and_render_does_not_write(self):
+        """Задания ставит сохранение поста, а не отрисовка страницы."""
+        post = Post.objects.create(author=self.user, text='Без формы',
+                                   image=self.image_file('other.png'))
+        self.assertEqual(post.thumbnails.count(), 3)
+        post.thumbnails.all().delete()
+        with self.assertNumQueries(1):
+            self.assertEqual(thumbnails.thumbnail_url(post, '960x339'), '')
+        self.assertEqual(post.thumbnails.count(), 0)
+
+    def test_only_new_image_is_queued(self):
+        """Правка текста не ставит задания заново, новая картинка ставит."""
+        post = Post.objects.create(author=self.user, text='Картинка',
+                                   image=self.image_file('first.png'))
+        thumbnails.process_pending()
+        post.text = 'Другой текст'
+        post.save()
+        self.assertFalse(
+            post.thumbnails.exclude(status=Thumbnail.READY).exists())
+        post.image = self.image_file('second.png')
+        post.save()
+        self.assertEqual(
+            set(post.thumbnails.values_list('status', flat=True)),
+            {Thumbnail.PENDING})
+
+    def test_submit_without_pool_processes_jobs(self):
+        """Без пула потоков задания выполняются сразу."""
+        post = Post.objects.create(author=self.user, text='Сразу',
+                                   image=self.image_file('now.png'))
+        thumbnails.schedule(post)
+        thumbnails.submit(post.thumbnails.values_list('id', flat=True))
+        self.assertFalse(
+            post.thumbnails.exclude(status=Thumbnail.READY).exists())
+
+    def test_existing_image_post_gets_thumbnailed(self):
+        """Картинка без заданий (bulk_create, старые посты) дополняется."""
+        name = default_storage.save('posts/old.png', self.image_file())
+        Post.objects.bulk_create(
+            [Post(author=self.user, text='Старый пост', image=name)])
+        post = Post.objects.get(text='Старый пост')
+        self.assertFalse(post.thumbnails.exists())
+        call_command('process_thumbnails', '--missing',
+                     stdout=open(os.devnull, 'w'))
+        self.assertEqual(
+            set(post.thumbnails.values_list('geometry', 'status')),
+            {(geometry, Thumbnail.READY)
+             for geometry in thumbnails.GEOMETRIES})
+        self.assertEqual(thumbnails.enqueue_missing(), 0)
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, Client, override_settings
+from django.urls import reverse
+
+from posts.models import Follow, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class TimelineTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем автора с постами и подписчика."""
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.follower = User.objects.create_user(username='follower')
+        Post.objects.bulk_create(
+            Post(author=cls.author, text=f'Старый пост {i}')
+            for i in range(3)
+        )
+
+    def setUp(self):
+        self.follower_client = Client()
+        self.follower_client.force_login(self.follower)
+
+    def feed_ids(self):
+        response = self.follower_client.get(reverse('posts:follow_index'))
+        return [post.id for post in response.context['page_obj']]
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка заполняет ленту, отписка очищает её."""
+        self.follower_client.get(reverse(
+            'posts:profile_follow', kwargs={'username': 'author'}))
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.follower).count(), 3)
+        self.follower_client.get(reverse(
+            'posts:profile_unfollow', kwargs={'username': 'author'}))
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        self.assertEqual(self.feed_ids(), [])
+
+    def test_new_post_fans_out(self):
+        """Новый пост попадает в ленту подписчика."""
+        Follow.objects.create(user=self.follower, author=self.author)
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertTrue(TimelineEntry.objects.filter(
+            user=self.follower, post=post).exists())
+        self.assertEqual(self.feed_ids()[0], post.id)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_heavy_author_merged_on_read(self):
+        """Посты «тяжёлого» автора подмешиваются в ленту при чтении."""
+        for username in ('fan_1', 'fan_2'):
+            fan = User.objects.create_user(username=username)
+            Follow.objects.create(user=fan, author=self.author)
+        follow = Follow.objects.create(user=self.follower, author=self.author)
+        self.assertFalse(follow.pushed)
+        self.assertFalse(
+            TimelineEntry.objects.filter(user=self.follower).exists())
+        post = Post.objects.create(author=self.author, text='Новый пост')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+        expected = list(
+            Post.objects.filter(author=self.author)
+            .order_by('-pub_date', '-id').values_list('id', flat=True))
+        self.assertEqual(self.feed_ids(), expected)
+
+    @override_settings(TIMELINE_FANOUT_LIMIT=2)
+    def test_cursor_walks_merged_feed(self):
+        """Курсор ленты подписок проходит обе выборки без пропусков."""
+        heavy = User.objects.create_user(username='heavy')
+        for username in ('fan_1', 'fan_2'):
+            fan = User.objects.create_user(username=username)
+            Follow.objects.create(user=fan, author=heavy)
+        Follow.objects.create(user=self.follower, author=self.author)
+        Follow.objects.create(user=self.follower, author=heavy)
+        for i in range(8):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            Post.objects.create(author=heavy, text=f'Пост {i}')
+        expected = list(
+            Post.objects.filter(author__in=[self.author, heavy])
+            .order_by('-pub_date', '-id').values_list('id', flat=True))
+        seen, cursor = [], None
+        while True:
+            response = self.follower_client.get(
+                reverse('posts:follow_index'), {'cursor': cursor or ''})
+            page = response.context['page_obj']
+            seen.extend(post.id for post in page)
+            cursor = page.next_cursor
+            if not cursor:
+                break
+        self.assertEqual(seen, expected)
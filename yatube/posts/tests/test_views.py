@@ -1,5 +1,7 @@
+import base64
 import tempfile
 import shutil
+from unittest import mock
 
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
@@ -8,8 +10,10 @@ from django.urls import reverse
 from django import forms
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.paginator import Page
 
-from posts.models import Group, Post, Follow
+from core.paginator import CursorPaginator
+from posts.models import Comment, Group, Post, Follow
 from posts.forms import PostForm
 
 User = get_user_model()
@@ -72,6 +76,7 @@ class PostVIEWSTest(TestCase):
 
     def setUp(self):
         """Создаем авторизованного и неавторизованного клиента"""
+        cache.clear()
         self.guest_client = Client()
         self.authorized_client = Client()
         self.authorized_client.force_login(self.user)
@@ -210,12 +215,41 @@ class PostVIEWSTest(TestCase):
     def test_cache_index_page(self):
         """Тест для проверки кеширования главной страницы."""
         response = self.guest_client.get(reverse('posts:index'))
-        self.posts[0].delete()
-        response_afdel = self.guest_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, response_afdel.content)
+        Post.objects.filter(id=self.posts[0].id).update(text='Тихая правка')
+        response_afupd = self.guest_client.get(reverse('posts:index'))
+        self.assertEqual(response.content, response_afupd.content)
         cache.clear()
         response_cl = self.guest_client.get(reverse('posts:index'))
-        self.assertNotEqual(response_cl.content, response_afdel.content)
+        self.assertNotEqual(response_cl.content, response_afupd.content)
+
+    def test_cached_fragment_skips_paginator(self):
+        """При попадании во фрагмент страница ленты не читается из базы."""
+        self.authorized_client.get(reverse('posts:index'))
+        with mock.patch('core.paginator.CursorPaginator.get_page') as get_page:
+            response = self.authorized_client.get(reverse('posts:index'))
+        get_page.assert_not_called()
+        self.assertContains(response, self.posts[0].text)
+
+    def test_cache_invalidated_on_changes(self):
+        """Удаление поста и правка группы сразу видны в лентах."""
+        urls = (
+            reverse('posts:index'),
+            reverse('posts:group_list', kwargs={'slug': self.group.slug}),
+            reverse('posts:profile', kwargs={'username': self.user}),
+        )
+        post = self.posts_gr[0]
+        before = [self.guest_client.get(url).content for url in urls]
+        post.delete()
+        for url, content in zip(urls, before):
+            with self.subTest(url=url):
+                self.assertNotIn(post.text.encode(),
+                                 self.guest_client.get(url).content)
+                self.assertIn(post.text.encode(), content)
+        group = Group.objects.get(id=self.group.id)
+        group.title = 'renamed_group'
+        group.save()
+        self.assertIn(b'renamed_group',
+                      self.guest_client.get(reverse('posts:index')).content)
 
     def sub_unsub(self, author, follower, url):
         self.authorized_client.force_login(follower)
@@ -236,11 +270,12 @@ class PostVIEWSTest(TestCase):
                                 'posts:profile_follow')
         new_post = Post.objects.create(author=new_author,
                                        text='new_author teeeext')
+        subscr = self.authorized_client.get(reverse('posts:follow_index'))
         count_folauthors = Follow.objects.filter(author=new_author,
                                                  user=new_follower).count()
         self.assertEqual(subscr.context['favt'], count_folauthors)
-        self.assertEqual(subscr.context['posts'][0].author, new_author)
-        self.assertEqual(subscr.context['posts'][0].text, new_post.text)
+        self.assertEqual(subscr.context['page_obj'][0].author, new_author)
+        self.assertEqual(subscr.context['page_obj'][0].text, new_post.text)
 
         # отписываемся от new_author
         unsubscr = self.sub_unsub(
@@ -248,9 +283,12 @@ class PostVIEWSTest(TestCase):
         self.assertNotEqual(unsubscr.context['favt'], count_folauthors)
 
         # подписываемся на self.user
-        self.sub_unsub(self.user, new_follower, 'posts:profile_follow')
-        self.assertNotEqual(unsubscr.context['posts'][0].author, new_author)
-        self.assertNotEqual(subscr.context['posts'][0].text, new_post.text)
+        resubscr = self.sub_unsub(self.user, new_follower,
+                                  'posts:profile_follow')
+        self.assertNotEqual(resubscr.context['page_obj'][0].author,
+                            new_author)
+        self.assertNotEqual(resubscr.context['page_obj'][0].text,
+                            new_post.text)
 
 
 class PaginatorViewsTest(TestCase):
@@ -316,3 +354,112 @@ class PaginatorViewsTest(TestCase):
                 + '?page=2')
         self.assertEqual(len(response.context['page_obj']),
                          len(self.pag_posts) - per_page)
+
+    def test_lazy_page_reads_on_first_access(self):
+        """Проверка: ленивая страница читает записи при первом обращении."""
+        rest = len(self.pag_posts) - per_page
+        paginator = CursorPaginator(Post.objects.all(), per_page)
+        with self.assertNumQueries(0):
+            page = paginator.get_lazy_page(None, '2')
+        self.assertIs(type(page), Page)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(page), rest)
+            self.assertEqual(len(list(page)), rest)
+        self.assertEqual(page.number, 2)
+        self.assertTrue(page.has_previous())
+        self.assertFalse(page.has_next())
+
+    def test_cursor_pages_cover_feed(self):
+        """Проверка: переход по курсорам проходит ленту без пропусков."""
+        response = self.author_client.get(reverse('posts:index'))
+        page_obj = response.context['page_obj']
+        self.assertFalse(page_obj.has_previous())
+        seen = [post.id for post in page_obj]
+        response = self.author_client.get(
+            reverse('posts:index') + f'?cursor={page_obj.next_cursor}')
+        page_obj = response.context['page_obj']
+        seen += [post.id for post in page_obj]
+        self.assertFalse(page_obj.has_next())
+        expected = list(Post.objects.order_by('-pub_date', '-id')
+                        .values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+        response = self.author_client.get(
+            reverse('posts:index') + f'?cursor={page_obj.previous_cursor}')
+        self.assertEqual([post.id for post in response.context['page_obj']],
+                         expected[:per_page])
+
+    def test_broken_cursor_returns_first_page(self):
+        """Проверка: испорченный курсор открывает первую страницу."""
+        response = self.author_client.get(reverse('posts:index')
+                                          + '?cursor=broken')
+        self.assertEqual(len(response.context['page_obj']), per_page)
+        self.assertFalse(response.context['page_obj'].has_previous())
+
+    def test_cursor_with_wrong_values_returns_first_page(self):
+        """Проверка: курсор с null и чужими типами — первая страница."""
+        for raw in ('[[null,null],0]', '[["",""],0]', '[[1,2],0]',
+                    '[{"a":1},0]', '[["2020-01-01",{}],0]'):
+            cursor = base64.urlsafe_b64encode(raw.encode()).decode()
+            with self.subTest(raw=raw):
+                response = self.author_client.get(
+                    reverse('posts:index'), {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                page_obj = response.context['page_obj']
+                self.assertEqual(len(page_obj), per_page)
+                self.assertFalse(page_obj.has_previous())
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class CommentPaginationTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        """Создаем пост с двенадцатью комментариями разных авторов."""
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='commented')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        for i in range(12):
+            author = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=cls.post, author=author,
+                                   text=f'Комментарий {i}')
+        cls.expected = list(cls.post.comments.order_by('-created', '-id')
+                            .values_list('id', flat=True))
+
+    def setUp(self):
+        cache.clear()
+        self.guest_client = Client()
+
+    def test_post_detail_renders_first_page(self):
+        """Страница поста выводит только первую страницу комментариев."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        comments = response.context['comments']
+        self.assertEqual([comment.id for comment in comments],
+                         self.expected[:5])
+        self.assertTrue(comments.has_next())
+        self.assertContains(response, reverse('posts:post_comments',
+                                              args=[self.post.id]))
+
+    def test_fragments_cover_all_comments(self):
+        """Фрагменты по курсорам проходят комментарии без пропусков."""
+        response = self.guest_client.get(
+            reverse('posts:post_detail', args=[self.post.id]))
+        comments = response.context['comments']
+        seen = [comment.id for comment in comments]
+        while comments.has_next():
+            url = (reverse('posts:post_comments', args=[self.post.id])
+                   + f'?cursor={comments.next_cursor}')
+            with self.assertNumQueries(3):
+                response = self.guest_client.get(url)
+            self.assertTemplateUsed(response, 'posts/includes/comments.html')
+            self.assertTemplateNotUsed(response, 'base.html')
+            comments = response.context['comments']
+            seen += [comment.id for comment in comments]
+        self.assertEqual(seen, self.expected)
+
+    def test_fragment_for_missing_post(self):
+        """Для несуществующего поста фрагмент отвечает 404."""
+        response = self.guest_client.get(
+            reverse('posts:post_comments', args=[0]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,203 @@
+"""
+Фоновая подготовка миниатюр картинок постов.
+
+Сохранение поста с новой картинкой (сигнал post_save) заводит задание
+в таблице Thumbnail для каждого известного размера, а сама нарезка
+выполняется пулом потоков после фиксации транзакции. Шаблоны берут
+готовый адрес миниатюры через тег post_thumbnail_url и до готовности
+показывают заглушку; отрисовка страниц ничего не пишет в базу, поэтому
+Pillow не работает на пути запроса.
+
+С THUMBNAIL_WORKERS = 0 пул не заводится и миниатюры режутся сразу
+после фиксации транзакции в том же потоке — так работают тесты.
+
+Задания, оставшиеся в очереди после перезапуска, дорабатывает команда
+``manage.py process_thumbnails``; с ``--missing`` она сначала ставит
+задания для картинок, у которых миниатюр нет вовсе.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import get_thumbnail
+
+from core import metrics
+from posts import feed_cache
+from posts.models import Post, Thumbnail
+
+logger = logging.getLogger(__name__)
+
+GEOMETRIES = ('960x339', '960x400', '960x500')
+OPTIONS = {'crop': 'top', 'upscale': True}
+MAX_ATTEMPTS = 3
+
+DURATION = metrics.Histogram('yatube_thumbnail_duration_seconds',
+                             'Время нарезки одной миниатюры.',
+                             ('geometry', 'status'))
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'THUMBNAIL_WORKERS', 2),
+                thread_name_prefix='thumbnails',
+            )
+    return _executor
+
+
+def _cache_key(post_id: int, geometry: str, source: str) -> str:
+    return f'post-thumbnail:{post_id}:{geometry}:{source}'
+
+
+def schedule(post: Post) -> None:
+    """Ставит в очередь миниатюры всех размеров для картинки поста."""
+    if not post.image:
+        return
+    ids = []
+    for geometry in GEOMETRIES:
+        thumbnail, _ = Thumbnail.objects.update_or_create(
+            post=post, geometry=geometry,
+            defaults={'source': post.image.name, 'status': Thumbnail.PENDING,
+                      'url': '', 'attempts': 0, 'error': ''},
+        )
+        ids.append(thumbnail.id)
+    transaction.on_commit(lambda: submit(ids))
+
+
+def submit(ids) -> None:
+    """Отдаёт задания пулу; без пула нарезает их сразу после фиксации."""
+    if not getattr(settings, 'THUMBNAIL_WORKERS', 2):
+        for thumbnail_id in ids:
+            process(thumbnail_id)
+        return
+    for thumbnail_id in ids:
+        executor().submit(_run, thumbnail_id)
+
+
+def _run(thumbnail_id: int) -> None:
+    try:
+        process(thumbnail_id)
+    except Exception:
+        logger.exception('Thumbnail job %s crashed', thumbnail_id)
+    finally:
+        close_old_connections()
+
+
+def process(thumbnail_id: int) -> None:
+    """Нарезает одну миниатюру; вызывается в потоке пула или командой."""
+    thumbnail = (Thumbnail.objects.select_related('post')
+                 .filter(id=thumbnail_id, status=Thumbnail.PENDING).first())
+    if thumbnail is None:
+        return
+    post = thumbnail.post
+    if post.image.name != thumbnail.source:
+        # Картинку успели заменить: задание для новой уже поставлено.
+        return
+    start = time.perf_counter()
+    try:
+        url = get_thumbnail(post.image, thumbnail.geometry, **OPTIONS).url
+        if not url:
+            raise ValueError('empty thumbnail url')
+    except Exception as error:
+        DURATION.observe(time.perf_counter() - start,
+                         geometry=thumbnail.geometry, status='failed')
+        attempts = thumbnail.attempts + 1
+        Thumbnail.objects.filter(id=thumbnail.id).update(
+            attempts=attempts, error=str(error),
+            status=(Thumbnail.FAILED if attempts >= MAX_ATTEMPTS
+                    else Thumbnail.PENDING))
+        logger.warning('Thumbnail %s failed: %s', thumbnail, error)
+        return
+    DURATION.observe(time.perf_counter() - start,
+                     geometry=thumbnail.geometry, status='ready')
+    Thumbnail.objects.filter(id=thumbnail.id).update(
+        status=Thumbnail.READY, url=url, error='')
+    cache.set(_cache_key(post.id, thumbnail.geometry, thumbnail.source), url,
+              None)
+    feed_cache.bump_post(post)
+
+
+def thumbnail_url(post: Post, geometry: str) -> str:
+    """Адрес готовой миниатюры или пустая строка."""
+    if not post.image:
+        return ''
+    key = _cache_key(post.id, geometry, post.image.name)
+    url = cache.get(key)
+    if url is not None:
+        return url
+    thumbnail = (Thumbnail.objects
+                 .filter(post_id=post.id, geometry=geometry)
+                 .values('status', 'source', 'url').first())
+    if (thumbnail is None or thumbnail['source'] != post.image.name
+            or thumbnail['status'] != Thumbnail.READY):
+        return ''
+    cache.set(key, thumbnail['url'], None)
+    return thumbnail['url']
+
+
+def thumbnail_urls(posts, geometry: str) -> dict:
+    """
+    Адреса миниатюр страницы постов: {id поста: адрес или ''}.
+
+    Готовые адреса читаются из кеша одним запросом, остальные — одним
+    запросом к Thumbnail, и найденные кладутся в кеш.
+    """
+    keys = {_cache_key(post.id, geometry, post.image.name): post
+            for post in posts if post.image}
+    found = cache.get_many(keys)
+    missing = {keys[key].id: key for key in keys if key not in found}
+    if missing:
+        ready = {}
+        rows = (Thumbnail.objects
+                .filter(post_id__in=missing, geometry=geometry,
+                        status=Thumbnail.READY)
+                .values_list('post_id', 'source', 'url'))
+        for post_id, source, url in rows:
+            key = missing[post_id]
+            if source == keys[key].image.name:
+                ready[key] = url
+        if ready:
+            cache.set_many(ready, None)
+        found.update(ready)
+    return {post.id: found.get(key, '') for key, post in keys.items()}
+
+
+def enqueue_missing(batch_size=500) -> int:
+    """
+    Ставит задания для картинок постов, у которых нет миниатюр.
+
+    Сигнал заводит задания только при сохранении поста с новой
+    картинкой, поэтому посты, созданные bulk_create (наполнение базы)
+    или до появления миниатюр, дополняются здесь. Возвращает число
+    поставленных заданий.
+    """
+    existing = set(Thumbnail.objects.values_list('post_id', 'geometry'))
+    posts = (Post.objects.exclude(image='').exclude(image__isnull=True)
+             .values_list('id', 'image').iterator())
+    jobs = [Thumbnail(post_id=post_id, geometry=geometry, source=image)
+            for post_id, image in posts for geometry in GEOMETRIES
+            if (post_id, geometry) not in existing]
+    Thumbnail.objects.bulk_create(jobs, batch_size=batch_size,
+                                  ignore_conflicts=True)
+    return len(jobs)
+
+
+def process_pending(limit=None) -> int:
+    """Синхронно дорабатывает очередь, возвращает число заданий."""
+    ids = (Thumbnail.objects.filter(status=Thumbnail.PENDING)
+           .order_by('created').values_list('id', flat=True))
+    if limit:
+        ids = ids[:limit]
+    ids = list(ids)
+    for thumbnail_id in ids:
+        process(thumbnail_id)
+    return len(ids)
@@ -0,0 +1,110 @@
+"""
+Материализованные ленты подписок (fan-out on write).
+
+При публикации пост раскладывается в ленты подписчиков автора, поэтому
+чтение ленты — выборка по индексу (user, -pub_date, -post). Посты авторов
+с большим числом подписчиков не раскладываются: подписки на таких
+авторов помечаются pushed=False, а их посты подмешиваются при чтении.
+"""
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, F
+
+from posts.models import Follow, Post, TimelineEntry
+
+BATCH_SIZE = 500
+# Ключ ленты подписок: дата и id поста из записи ленты (см. feed_sources).
+ORDERING = ('-feed_date', '-feed_post')
+
+
+def fanout_limit() -> int:
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', 10000)
+
+
+def is_heavy_author(author_id: int) -> bool:
+    """Автор, посты которого подмешиваются в ленты при чтении."""
+    return Follow.objects.filter(author_id=author_id).count() >= fanout_limit()
+
+
+def fan_out(post: Post) -> None:
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    followers = Follow.objects.filter(author_id=post.author_id, pushed=True)
+    if followers.count() >= fanout_limit():
+        # Автор стал «тяжёлым»: дальше его посты читаются при выдаче.
+        followers.update(pushed=False)
+        return
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=user_id, post_id=post.id,
+                       pub_date=post.pub_date)
+         for user_id in followers.values_list('user_id', flat=True)),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(follow: Follow) -> None:
+    """Добавляет в ленту подписчика уже опубликованные посты автора."""
+    if not follow.pushed:
+        return
+    posts = Post.objects.filter(
+        author_id=follow.author_id).values_list('id', 'pub_date')
+    TimelineEntry.objects.bulk_create(
+        (TimelineEntry(user_id=follow.user_id, post_id=post_id,
+                       pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def trim(follow: Follow) -> None:
+    """Убирает из ленты бывшего подписчика посты автора."""
+    TimelineEntry.objects.filter(
+        user_id=follow.user_id, post__author_id=follow.author_id).delete()
+
+
+def rebuild() -> None:
+    """Пересобирает все ленты, например после bulk_create подписок."""
+    entries = TimelineEntry._meta.db_table
+    follows = Follow._meta.db_table
+    posts = Post._meta.db_table
+    heavy = (Follow.objects.values('author').order_by()
+             .annotate(followers=Count('id'))
+             .filter(followers__gte=fanout_limit()).values('author'))
+    with transaction.atomic(), connection.cursor() as cursor:
+        Follow.objects.exclude(pushed=True).update(pushed=True)
+        Follow.objects.filter(author__in=heavy).update(pushed=False)
+        cursor.execute(f'DELETE FROM {entries}')
+        cursor.execute(
+            f'INSERT INTO {entries} (user_id, post_id, pub_date) '
+            f'SELECT f.user_id, p.id, p.pub_date FROM {follows} f '
+            f'JOIN {posts} p ON p.author_id = f.author_id '
+            f'WHERE f.pushed')
+
+
+def pulled_authors(user) -> list:
+    """Авторы, посты которых подмешиваются в ленту при чтении."""
+    return list(Follow.objects.filter(user=user, pushed=False)
+                .values_list('author_id', flat=True))
+
+
+def feed_sources(user, pulled=None) -> list:
+    """
+    Выборки постов, из которых собирается лента подписок.
+
+    Первая выборка — материализованная лента, вторая (если нужна) —
+    посты «тяжёлых» авторов, на которых подписан пользователь. Обе
+    размечены ключом ORDERING: у материализованной ленты он берётся
+    из TimelineEntry, и страница читается по индексу
+    (user, -pub_date, -post) без сортировки во временном дереве.
+    """
+    sources = [Post.objects.filter(timeline_entries__user=user).annotate(
+        feed_date=F('timeline_entries__pub_date'),
+        feed_post=F('timeline_entries__post'),
+    )]
+    if pulled is None:
+        pulled = pulled_authors(user)
+    if pulled:
+        sources.append(Post.objects.filter(author_id__in=pulled).annotate(
+            feed_date=F('pub_date'), feed_post=F('id')))
+    return sources
@@ -1,71 +1,108 @@
 import datetime
 
 from django.shortcuts import render, get_object_or_404, redirect
-from django.http import HttpResponse, HttpRequest
+from django.http import Http404, HttpResponse, HttpRequest
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.paginator import Page
+from django.db import transaction
+from django.views.decorators.http import condition
 
 from posts.models import Post, Group, User, Comment, Follow
 from posts.forms import PostForm, CommentForm
+from posts import counters, feed_cache, search as post_search
+from posts import conditional, page_cache, timeline
+from core.paginator import CursorPaginator, MergedCursorPaginator
 from django.conf import settings
 
 per_page = settings.PERPAGE
 
 
+def get_page_obj(request: HttpRequest, posts, *more_posts,
+                 ordering=('-pub_date', '-id')) -> Page:
+    """
+    Возвращает страницу ленты по курсору из ?cursor= (или ?page=).
+
+    Записи читаются при первом обращении: карточки и навигация лент
+    лежат во фрагменте {% feedcache %}, и при попадании запросы
+    пагинатора не выполняются.
+    """
+    if more_posts:
+        paginator = MergedCursorPaginator((posts, *more_posts), per_page,
+                                          ordering)
+    else:
+        paginator = CursorPaginator(posts, per_page, ordering)
+    return paginator.get_lazy_page(request.GET.get('cursor'),
+                                   request.GET.get('page'))
+
+
+def get_comments_page(request: HttpRequest, post_id: int) -> Page:
+    """Возвращает страницу комментариев поста по курсору из ?cursor=."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author')
+    paginator = CursorPaginator(comments, settings.COMMENTS_PER_PAGE,
+                                ordering=('-created', '-id'))
+    return paginator.get_page(request.GET.get('cursor'),
+                              request.GET.get('page'))
+
+
+@condition(etag_func=conditional.index_etag)
 def index(request: HttpRequest) -> HttpResponse:
     """Модуль отвечающий за главную страницу."""
-    posts: Post = Post.objects.all()
-    avt = User.objects.all().count()
-    fol_avt = Follow.objects.all().count()
-    paginator = Paginator(posts, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_cache.depends_on(request, 'index', 'totals')
+    posts: Post = Post.objects.for_feed()
+    avt = counters.total('users')
+    fol_avt = counters.total('follows')
     context = {
         'posts': posts,
-        'page_obj': page_obj,
+        'page_obj': get_page_obj(request, posts),
         'page_title': 'Последние обновления на сайте',
+        'feed_key': feed_cache.fragment_key('index', ['index'], request),
         'avt': avt,
         'favt': fol_avt,
     }
     return render(request, 'posts/index.html', context)
 
 
+@condition(etag_func=conditional.group_etag)
 def group_posts(request: HttpRequest, slug: str) -> HttpResponse:
     """Модуль отвечающий за страницу сообщества."""
     group = get_object_or_404(Group, slug=slug)
-    posts = Post.objects.filter(group=group)
-    paginator = Paginator(posts, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_cache.depends_on(request, f'group:{group.id}')
+    posts = group.posts.for_feed()
     context = {
         'group': group,
         'posts': posts,
-        'page_obj': page_obj,
+        'page_obj': get_page_obj(request, posts),
         'page_title': f'Записи сообщества {slug}',
-        'gr_descr': group.description
+        'gr_descr': group.description,
+        'feed_key': feed_cache.fragment_key(
+            'group', [f'group:{group.id}'], request),
     }
     return render(request, 'posts/group_list.html', context)
 
 
+@condition(etag_func=conditional.profile_etag)
 def profile(request: HttpRequest, username: str) -> HttpResponse:
     """Модуль отвечающий за личную страницу."""
     author = get_object_or_404(User, username=username)
-    paginator = Paginator(author.posts.all(), per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_cache.depends_on(request, f'profile:{author.id}')
     user = request.user
     following = False
     if user.is_authenticated:
         following = Follow.objects.filter(user=user, author=author).exists()
     context = {
         'author': author,
-        'page_obj': page_obj,
+        'page_obj': get_page_obj(request, author.posts.for_feed()),
         'posts': author.posts.all(),
         'following': following,
+        'stats': counters.author_stats(author.id),
+        'feed_key': feed_cache.fragment_key(
+            'profile', [f'profile:{author.id}'], request),
     }
     return render(request, 'posts/profile.html', context)
 
 
+@condition(etag_func=conditional.post_etag)
 def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
     """Модуль отвечающий за просмотр отдельного поста."""
     post = get_object_or_404(
@@ -73,18 +110,45 @@ def post_detail(request: HttpRequest, post_id: int) -> HttpResponse:
             .select_related('author')
             .select_related('group'), id=post_id)
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
+    comments = get_comments_page(request, post.id)
     context = {
         'post': post,
         'id': post_id,
         'page_title': post.text[:30],
         'form': form,
         'comments': comments,
+        'author_stats': counters.author_stats(post.author_id),
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+@condition(etag_func=conditional.post_etag)
+def post_comments(request: HttpRequest, post_id: int) -> HttpResponse:
+    """Модуль отдаёт страницу комментариев поста фрагментом HTML."""
+    if not Post.objects.filter(id=post_id).exists():
+        raise Http404
+    context = {
+        'comments': get_comments_page(request, post_id),
+        'post_id': post_id,
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
+def search(request: HttpRequest) -> HttpResponse:
+    """Модуль отвечающий за поиск по тексту постов."""
+    query = request.GET.get('q', '').strip()
+    results = post_search.get_backend().search(
+        query, request.GET.get('cursor'), per_page)
+    context = {
+        'query': query,
+        'results': results,
+        'page_title': f'Поиск: {query}' if query else 'Поиск',
+    }
+    return render(request, 'posts/search.html', context)
+
+
 @login_required
+@transaction.atomic
 def post_create(request: HttpRequest) -> HttpResponse:
     """Модуль отвечающий за страницу создания текста постов."""
     if request.method != 'POST':
@@ -132,6 +196,7 @@ def post_edit(request: HttpRequest, post_id: int) -> HttpResponse:
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, post_id):
     """Модуль отвечающий за добавление комментариев к постам."""
     post = get_object_or_404(Post, id=post_id)
@@ -150,18 +215,22 @@ def follow_index(request):
     Модуль выводит посты авторов,
     на которых подписан пользователь.
     """
-    posts = Post.objects.filter(
-        author__following__user=request.user
-    ).select_related('author', 'group')
-    fol_avt = Follow.objects.filter().count()
-    avt = User.objects.all().count()
-    paginator = Paginator(posts, per_page)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    pulled = timeline.pulled_authors(request.user)
+    sources = [
+        source.for_feed()
+        for source in timeline.feed_sources(request.user, pulled)
+    ]
+    fol_avt = counters.total('follows')
+    avt = counters.total('users')
     context = {
-        'posts': posts,
-        'page_obj': page_obj,
+        'page_obj': get_page_obj(request, *sources,
+                                 ordering=timeline.ORDERING),
         'page_title': 'ИЗБРАННЫЕ АВТОРЫ',
+        'feed_key': feed_cache.fragment_key(
+            'follow',
+            [f'follow:{request.user.id}',
+             *(f'profile:{author_id}' for author_id in pulled)],
+            request),
         'avt': avt,
         'favt': fol_avt,
     }
@@ -169,22 +238,24 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     """Модуль подписывает на определенного автора."""
     user = request.user
     author = User.objects.get(username=username)
-    if user != author and not Follow.objects.filter(author=author,
-                                                    user=user).exists():
-        Follow.objects.create(author=author, user=request.user)
+    if user != author:
+        # Уникальность (user, author) гарантирует база, get_or_create
+        # переживает гонку двух одновременных подписок.
+        Follow.objects.get_or_create(author=author, user=user)
     return redirect('posts:follow_index')
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     """Модуль отписывает от определенного автора."""
-    'posts:profile_unfollow'
     author = User.objects.get(username=username)
-    Follow.objects.filter(author=author).delete()
+    Follow.objects.filter(user=request.user, author=author).delete()
     return redirect('posts:follow_index')
 
 
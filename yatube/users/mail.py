@@ -0,0 +1,230 @@
+"""
+Фоновая отправка почты.
+
+EMAIL_BACKEND = 'users.mail.QueuedEmailBackend' не отправляет письма,
+а складывает их в таблицу OutgoingMail и после фиксации транзакции
+будит пул MAIL_WORKERS потоков. Поэтому регистрация и сброс пароля
+не ждут почтовый сервер, какой бы бэкенд ни стоял в
+MAIL_DELIVERY_BACKEND.
+
+Поток пула забирает до MAIL_BATCH_SIZE готовых писем и отправляет их
+через одно соединение с настоящим бэкендом. Неудачная отправка
+повторяется с удваивающейся задержкой, после MAX_ATTEMPTS попыток
+письмо помечается ошибкой. Забранные воркером письма на время
+LEASE_SECONDS недоступны другим воркерам, так что письма упавшего
+процесса достанутся следующему.
+
+Разобрав очередь, поток заводит один таймер на ближайший next_attempt
+оставшихся писем: повторы и просроченные аренды будят пул сами, без
+таймера на каждое письмо. Пул заводится при первом письме процесса
+и помнит pid: воркер, получивший модуль через fork от мастера
+(gunicorn --preload, uwsgi без lazy-apps), заводит свой пул и свой
+таймер, а не ждёт потоков, которых в нём нет. Первый же запуск пула
+разбирает и письма, оставшиеся после перезапуска.
+
+С MAIL_WORKERS = 0 пул не заводится и очередь разбирается сразу после
+фиксации транзакции в потоке запроса, а повторы не планируются: их
+дорабатывает команда ``manage.py send_queued_mail --interval N``,
+запущенная как служба.
+"""
+import logging
+import os
+import pickle
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from core import metrics
+from users.models import OutgoingMail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+LEASE_SECONDS = 60
+
+DELIVERY = metrics.Histogram('yatube_mail_delivery_seconds',
+                             'Время от постановки письма в очередь '
+                             'до отправки.', ('status',),
+                             buckets=(0.1, 0.5, 1, 5, 15, 60, 300, 1800))
+
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_retry = None
+_retry_lock = threading.Lock()
+
+
+def workers() -> int:
+    return getattr(settings, 'MAIL_WORKERS', 2)
+
+
+def batch_size() -> int:
+    return getattr(settings, 'MAIL_BATCH_SIZE', 50)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Задержка перед следующей попыткой: base, 2·base, 4·base…"""
+    base = getattr(settings, 'MAIL_RETRY_DELAY', 30)
+    return timedelta(seconds=base * 2 ** (attempts - 1))
+
+
+def executor() -> ThreadPoolExecutor:
+    """Пул потоков текущего процесса; после fork заводится заново."""
+    global _executor, _executor_pid, _retry
+    with _executor_lock:
+        if _executor is None or _executor_pid != os.getpid():
+            _executor = ThreadPoolExecutor(max_workers=workers(),
+                                           thread_name_prefix='mail')
+            _executor_pid = os.getpid()
+            # Таймер родителя в этом процессе не сработает.
+            _retry = None
+    return _executor
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Складывает письма в очередь вместо отправки."""
+
+    def send_messages(self, email_messages):
+        jobs = []
+        for message in email_messages:
+            message.connection = None
+            jobs.append(OutgoingMail(
+                subject=message.subject[:255],
+                recipients=', '.join(message.recipients()),
+                payload=pickle.dumps(message, pickle.HIGHEST_PROTOCOL),
+            ))
+        if not jobs:
+            return 0
+        OutgoingMail.objects.bulk_create(jobs)
+        transaction.on_commit(submit)
+        return len(jobs)
+
+
+def submit() -> None:
+    """Будит пул; без пула разбирает очередь сразу."""
+    if not workers():
+        process_pending()
+        return
+    executor().submit(_run)
+
+
+def _run() -> None:
+    try:
+        while process_batch():
+            pass
+        schedule_retry(next_attempt())
+    except Exception:
+        logger.exception('Mail queue worker crashed')
+    finally:
+        close_old_connections()
+
+
+def next_attempt():
+    """Ближайший срок повтора или конца аренды среди писем очереди."""
+    return (OutgoingMail.objects.filter(status=OutgoingMail.PENDING)
+            .order_by('next_attempt')
+            .values_list('next_attempt', flat=True).first())
+
+
+def schedule_retry(when) -> None:
+    """Будит пул к сроку when, если раньше него таймер не заведён."""
+    global _retry
+    if when is None or not workers():
+        return
+    with _retry_lock:
+        if _retry is not None:
+            due, timer = _retry
+            if timer.is_alive() and due <= when:
+                return
+            timer.cancel()
+        delay = max((when - timezone.now()).total_seconds(), 0)
+        timer = threading.Timer(delay, submit)
+        timer.daemon = True
+        timer.start()
+        _retry = (when, timer)
+
+
+def claim(limit: int) -> list:
+    """Забирает до limit готовых писем в работу этому воркеру."""
+    now = timezone.now()
+    ready = OutgoingMail.objects.filter(status=OutgoingMail.PENDING,
+                                        next_attempt__lte=now)
+    ids = list(ready.order_by('next_attempt')
+               .values_list('id', flat=True)[:limit])
+    if not ids:
+        return []
+    token = uuid.uuid4().hex
+    ready.filter(id__in=ids).update(
+        claim=token, next_attempt=now + timedelta(seconds=LEASE_SECONDS))
+    return list(OutgoingMail.objects.filter(claim=token))
+
+
+def process_batch() -> int:
+    """Отправляет одну пачку писем через одно соединение."""
+    jobs = claim(batch_size())
+    if not jobs:
+        return 0
+    connection = get_connection(getattr(
+        settings, 'MAIL_DELIVERY_BACKEND',
+        'django.core.mail.backends.filebased.EmailBackend'))
+    try:
+        connection.open()
+    except Exception as error:
+        for job in jobs:
+            fail(job, error)
+        return len(jobs)
+    try:
+        for job in jobs:
+            deliver(job, connection)
+    finally:
+        connection.close()
+    return len(jobs)
+
+
+def deliver(job: OutgoingMail, connection) -> None:
+    try:
+        message = pickle.loads(job.payload)
+        message.connection = connection
+        message.send()
+    except Exception as error:
+        fail(job, error)
+        return
+    now = timezone.now()
+    DELIVERY.observe((now - job.created).total_seconds(), status='sent')
+    OutgoingMail.objects.filter(id=job.id).update(
+        status=OutgoingMail.SENT, sent=now, claim='', error='',
+        attempts=job.attempts + 1)
+
+
+def fail(job: OutgoingMail, error: Exception) -> None:
+    attempts = job.attempts + 1
+    if attempts >= MAX_ATTEMPTS:
+        DELIVERY.observe((timezone.now() - job.created).total_seconds(),
+                         status='failed')
+        OutgoingMail.objects.filter(id=job.id).update(
+            status=OutgoingMail.FAILED, attempts=attempts, claim='',
+            error=str(error))
+        logger.error('Mail %s failed for good: %s', job.id, error)
+        return
+    delay = retry_delay(attempts)
+    OutgoingMail.objects.filter(id=job.id).update(
+        attempts=attempts, claim='', error=str(error),
+        next_attempt=timezone.now() + delay)
+    logger.warning('Mail %s failed, retry in %s: %s', job.id, delay, error)
+
+
+def process_pending() -> int:
+    """Синхронно разбирает готовые письма, возвращает их число."""
+    total = 0
+    while True:
+        done = process_batch()
+        if not done:
+            return total
+        total += done
@@ -0,0 +1,21 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from users import mail
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди OutgoingMail.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Повторять каждые N секунд.')
+
+    def handle(self, *args, **options):
+        while True:
+            done = mail.process_pending()
+            self.stdout.write(f'Обработано писем: {done}.')
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
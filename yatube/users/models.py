@@ -1,3 +1,39 @@
-# from django.db import models
+from django.db import models
+from django.utils import timezone
 
-# Create your models here.
+
+class OutgoingMail(models.Model):
+    """Письмо в очереди на отправку."""
+
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, 'В очереди'),
+        (SENT, 'Отправлено'),
+        (FAILED, 'Ошибка'),
+    )
+
+    subject = models.CharField('Тема', max_length=255)
+    recipients = models.TextField('Получатели')
+    # EmailMessage целиком, сериализованный pickle.
+    payload = models.BinaryField()
+    status = models.CharField(max_length=10, choices=STATUSES,
+                              default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # Не раньше этого времени письмо берётся в работу: задержка перед
+    # повтором или срок, на который его забрал воркер.
+    next_attempt = models.DateTimeField(default=timezone.now)
+    claim = models.CharField(max_length=32, blank=True)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt'],
+                         name='mail_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} → {self.recipients} {self.status}'
@@ -1,3 +1,174 @@
-# from django.test import TestCase
+import importlib
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail as outbox
+from django.core.mail import send_mail
+from django.core.mail.backends.base import BaseEmailBackend
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core import metrics
+from users import mail, views
+from users.models import OutgoingMail
+
+User = get_user_model()
+
+
+class FailingBackend(BaseEmailBackend):
+    """Почтовый сервер, который не принимает письма."""
+
+    def send_messages(self, email_messages):
+        raise ConnectionError('mail server is down')
+
+
+class SignUpMailTest(TestCase):
+
+    def test_import_sends_nothing(self):
+        """Импорт представлений не отправляет писем."""
+        importlib.reload(views)
+        self.assertEqual(outbox.outbox, [])
+
+    def test_signup_sends_welcome_mail(self):
+        """После регистрации пользователь получает приветственное письмо."""
+        response = self.client.post(reverse('users:signup'), {
+            'username': 'newcomer',
+            'email': 'newcomer@example.com',
+            'password1': 'Sl0zhny-parol',
+            'password2': 'Sl0zhny-parol',
+        })
+        self.assertRedirects(response, reverse('posts:index'))
+        self.assertEqual(len(outbox.outbox), 1)
+        self.assertEqual(outbox.outbox[0].to, ['newcomer@example.com'])
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.QueuedEmailBackend',
+    MAIL_DELIVERY_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+    MAIL_WORKERS=0,
+)
+class MailQueueTest(TestCase):
+
+    def setUp(self):
+        metrics.registry.reset()
+
+    def send(self, count=1):
+        for index in range(count):
+            send_mail(f'Письмо {index}', 'Текст', 'from@example.com',
+                      [f'user{index}@example.com'])
+
+    def test_signup_and_reset_only_enqueue(self):
+        """Регистрация и сброс пароля кладут письма в очередь."""
+        self.client.post(reverse('users:signup'), {
+            'username': 'newcomer',
+            'email': 'newcomer@example.com',
+            'password1': 'Sl0zhny-parol',
+            'password2': 'Sl0zhny-parol',
+        })
+        self.client.post(reverse('users:pass_res'),
+                         {'email': 'newcomer@example.com'})
+        self.assertEqual(OutgoingMail.objects.filter(
+            status=OutgoingMail.PENDING).count(), 2)
+        self.assertEqual(outbox.outbox, [])
+        self.assertEqual(mail.process_pending(), 2)
+        self.assertEqual(len(outbox.outbox), 2)
+        self.assertFalse(OutgoingMail.objects.exclude(
+            status=OutgoingMail.SENT).exists())
+
+    def test_batch_uses_one_connection(self):
+        """Пачка писем уходит через одно соединение."""
+        self.send(3)
+        with mock.patch('users.mail.get_connection',
+                        wraps=mail.get_connection) as get_connection:
+            mail.process_pending()
+        get_connection.assert_called_once()
+        self.assertEqual(len(outbox.outbox), 3)
+
+    @override_settings(MAIL_BATCH_SIZE=2)
+    def test_batch_size(self):
+        """Пачка не больше MAIL_BATCH_SIZE писем."""
+        self.send(3)
+        self.assertEqual(mail.process_batch(), 2)
+        self.assertEqual(mail.process_batch(), 1)
+        self.assertEqual(mail.process_batch(), 0)
+
+    @override_settings(MAIL_DELIVERY_BACKEND='users.tests.FailingBackend')
+    def test_retries_with_backoff(self):
+        """Неудачные попытки повторяются с удвоенной задержкой."""
+        self.send()
+        job = OutgoingMail.objects.get()
+        for attempt in range(1, mail.MAX_ATTEMPTS):
+            mail.process_pending()
+            job.refresh_from_db()
+            self.assertEqual(job.status, OutgoingMail.PENDING)
+            self.assertEqual(job.attempts, attempt)
+            delay = job.next_attempt - timezone.now()
+            expected = mail.retry_delay(attempt)
+            self.assertLess(abs(delay - expected), timedelta(seconds=5))
+            # Повтор ещё не наступил.
+            self.assertEqual(mail.process_pending(), 0)
+            OutgoingMail.objects.update(next_attempt=timezone.now())
+        mail.process_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, OutgoingMail.FAILED)
+        self.assertIn('mail server is down', job.error)
+
+    def test_delivery_latency_metric(self):
+        """Время доставки попадает в гистограмму."""
+        self.send()
+        mail.process_pending()
+        self.assertIn('yatube_mail_delivery_seconds_count{status="sent"} 1',
+                      metrics.registry.render())
+
+
+@override_settings(
+    EMAIL_BACKEND='users.mail.QueuedEmailBackend',
+    MAIL_DELIVERY_BACKEND='users.tests.FailingBackend',
+    MAIL_WORKERS=2,
+)
+class MailRetryTimerTest(TestCase):
+
+    def setUp(self):
+        patcher = mock.patch('users.mail.threading.Timer')
+        self.timer = patcher.start()
+        self.timer.return_value.is_alive.return_value = True
+        self.addCleanup(patcher.stop)
+        self.addCleanup(setattr, mail, '_retry', None)
+
+    def test_one_timer_per_batch(self):
+        """Неудачная пачка заводит один таймер на ближайший повтор."""
+        with mock.patch('users.mail.transaction.on_commit'):
+            for index in range(3):
+                send_mail(f'Письмо {index}', 'Текст', 'from@example.com',
+                          [f'user{index}@example.com'])
+        mail._run()
+        self.timer.assert_called_once()
+        delay = self.timer.call_args[0][0]
+        self.assertAlmostEqual(delay, mail.retry_delay(1).total_seconds(),
+                               delta=5)
+        self.assertEqual(OutgoingMail.objects.filter(attempts=1).count(), 3)
+
+    def test_later_retry_keeps_earlier_timer(self):
+        """Более поздний срок не заменяет заведённый таймер."""
+        now = timezone.now()
+        mail.schedule_retry(now + timedelta(seconds=30))
+        mail.schedule_retry(now + timedelta(seconds=60))
+        self.timer.assert_called_once()
+        mail.schedule_retry(now + timedelta(seconds=10))
+        self.assertEqual(self.timer.call_count, 2)
+        self.timer.return_value.cancel.assert_called_once()
+
+    def test_forked_process_gets_own_pool(self):
+        """Процесс после fork заводит свой пул и забывает таймер родителя."""
+        self.addCleanup(setattr, mail, '_executor', None)
+        pool = mail.executor()
+        self.addCleanup(pool.shutdown)
+        self.assertIs(mail.executor(), pool)
+        mail.schedule_retry(timezone.now() + timedelta(seconds=30))
+        with mock.patch('users.mail.os.getpid', return_value=-1):
+            child = mail.executor()
+        self.addCleanup(child.shutdown)
+        self.assertIsNot(child, pool)
+        self.assertIsNone(mail._retry)
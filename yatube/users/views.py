@@ -10,11 +10,15 @@ class SignUp(CreateView):
     success_url = reverse_lazy('posts:index')
     template_name = 'users/signup.html'
 
-
-send_mail(
-    'Тема письма',
-    'Текст письма.',
-    'from@example.com',
-    ['to@example.com'],
-    fail_silently=False,
-)
+    def form_valid(self, form):
+        """Регистрирует пользователя и шлёт ему приветственное письмо."""
+        response = super().form_valid(form)
+        if self.object.email:
+            send_mail(
+                'Добро пожаловать в Yatube',
+                f'{self.object.username}, вы зарегистрировались в Yatube.',
+                'from@example.com',
+                [self.object.email],
+                fail_silently=False,
+            )
+        return response
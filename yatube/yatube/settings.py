@@ -14,7 +14,6 @@ import os
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-print(BASE_DIR)
 # STATICFILES_DIRS = (os.path.join(BASE_DIR, 'static'),)
 PATH_TO_YOUR_STATIC_FOLDER = 'D:\\Dev\\hw05_final\\yatube\\static\\'
 STATICFILES_DIRS = [
@@ -56,6 +55,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.MetricsMiddleware',
+    'core.middleware.ProfilingMiddleware',
+    'core.routers.ReplicaMiddleware',
+    'posts.page_cache.PageCacheMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,12 +71,29 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'yatube.urls'
 
+# Вне разработки (или с CACHED_TEMPLATES=1) скомпилированные шаблоны
+# держит в памяти процесса cached.Loader, а yatube/wsgi.py компилирует
+# их все при старте воркера (core/warmup.py). При DEBUG шаблоны
+# перечитываются с диска, чтобы правки были видны без перезапуска.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+CACHED_TEMPLATES = os.environ.get('CACHED_TEMPLATES') == '1' or not DEBUG
+if CACHED_TEMPLATES:
+    TEMPLATE_LOADERS = [
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)]
+
+# debug_toolbar ищет свои шаблоны через APP_DIRS, а с явным списком
+# loaders его включать нельзя: app_directories.Loader уже в списке.
+SILENCED_SYSTEM_CHECKS = ['debug_toolbar.W006']
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS,
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -90,13 +110,66 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# CONN_MAX_AGE держит соединение между запросами, CONN_HEALTH_CHECKS
+# проверяет его перед повторным использованием, CONN_POOL_SIZE
+# ограничивает число соединений процесса с алиасом. Последние два
+# понимают бэкенды core.backends.sqlite3 и core.backends.postgresql
+# (см. core/db.py). В бою алиасы переключаются на PostgreSQL так:
+#
+#     'ENGINE': 'core.backends.postgresql',
+#     'NAME': 'yatube', 'USER': ..., 'PASSWORD': ..., 'HOST': ...,
+#     'CONN_MAX_AGE': 60, 'CONN_HEALTH_CHECKS': True, 'CONN_POOL_SIZE': 10,
+#
+# (нужен psycopg2). Стандартный django.db.backends.postgresql
+# эти ключи молча игнорирует.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 60,
+        'CONN_HEALTH_CHECKS': True,
+        'CONN_POOL_SIZE': None,
     }
 }
 
+# Реплика для чтения лент (см. core/routers.py). Локально это отдельный
+# файл, который обновляет команда sync_replicas; в тестах она зеркалит
+# default. Чтение с неё включается переменной окружения REPLICA_DATABASE.
+DATABASES['replica'] = {
+    'ENGINE': 'core.backends.sqlite3',
+    'NAME': os.environ.get('REPLICA_DATABASE',
+                           os.path.join(BASE_DIR, 'db-replica.sqlite3')),
+    'CONN_MAX_AGE': 60,
+    'CONN_HEALTH_CHECKS': True,
+    'TEST': {'MIRROR': 'default'},
+}
+DATABASE_REPLICAS = ['replica'] if os.environ.get('REPLICA_DATABASE') else []
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+REPLICA_VIEWS = [
+    'posts:index',
+    'posts:group_list',
+    'posts:profile',
+    'posts:post_detail',
+    'posts:post_comments',
+    'posts:follow_index',
+]
+# Сколько секунд после записи браузер читает только с default.
+REPLICA_PIN_SECONDS = 10
+
+# Прагмы каждого нового соединения SQLite (см. core/sqlite.py).
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
+}
+
+# Транзакции начинаются с BEGIN IMMEDIATE: писатели ждут друг друга
+# в пределах busy_timeout вместо ошибки «database is locked».
+SQLITE_IMMEDIATE_TRANSACTIONS = True
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -138,8 +211,17 @@ LOGIN_REDIRECT_URL = 'posts:index'
 # LOGOUT_REDIRECT_URL = 'posts:index'
 
 
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+# Письма копятся в очереди users.OutgoingMail и уходят фоном через
+# MAIL_DELIVERY_BACKEND (users/mail.py).
+EMAIL_BACKEND = 'users.mail.QueuedEmailBackend'
+MAIL_DELIVERY_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
+# Потоки отправки (0 — сразу после фиксации транзакции в потоке
+# запроса), размер пачки на одно соединение и первая задержка повтора
+# в секундах, дальше она удваивается.
+MAIL_WORKERS = int(os.environ.get('MAIL_WORKERS', 2))
+MAIL_BATCH_SIZE = 50
+MAIL_RETRY_DELAY = 30
 
 # Static files (CSS, JavaScript, Images)
 # https://docs.djangoproject.com/en/2.2/howto/static-files/
@@ -147,16 +229,80 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Кеш в файле SQLite общий для всех воркеров сервера (core/cache.py).
+# Тесты получают свой временный файл (core/testing.py), чтобы не видеть
+# версии и фрагменты лент, оставшиеся от других запусков.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'core.cache.SQLiteCache',
+        'LOCATION': os.environ.get(
+            'CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+            'MAX_SIZE': 256 * 1024 * 1024,
+        },
     }
 }
 
+TEST_RUNNER = 'core.testing.TestRunner'
+
 PERPAGE = 10
+# Комментарии под постом выводятся страницами по столько штук, следующие
+# подгружаются фрагментом с posts:post_comments.
+COMMENTS_PER_PAGE = 20
+
+# Авторы с таким числом подписчиков не раскладываются по лентам при
+# публикации, их посты подмешиваются в ленту подписок при чтении.
+TIMELINE_FANOUT_LIMIT = 10000
+
+# Фрагменты лент сбрасываются сигналами, поэтому TTL может быть долгим.
+FEED_CACHE_TIMEOUT = 60 * 60
+# Копия фрагментов в памяти процесса: сколько записей и сколько секунд.
+FEED_CACHE_L1_ENTRIES = 256
+FEED_CACHE_L1_TIMEOUT = 5
+# Сколько секунд после срока отдаётся прежний фрагмент, пока один воркер
+# считает новый, и сколько остальные ждут его, если прежнего нет.
+FEED_CACHE_STALE_TIMEOUT = 60
+FEED_CACHE_LOCK_TIMEOUT = 5
+
+# Страницы лент для анонимов сбрасываются сдвигом версий областей,
+# TTL лишь освобождает место (0 — кеш страниц выключен).
+PAGE_CACHE_TIMEOUT = 60 * 60
+
+# Бэкенд поиска по постам: FTS5 для SQLite или
+# 'posts.search.SimpleSearchBackend' для СУБД без полнотекстового индекса.
+POSTS_SEARCH_BACKEND = 'posts.search.SQLiteFTSBackend'
+
+# Потоки, нарезающие миниатюры картинок постов в фоне. При 0 миниатюры
+# режутся сразу после фиксации транзакции в том же потоке (так работают
+# тесты, core/testing.py).
+THUMBNAIL_WORKERS = int(os.environ.get('THUMBNAIL_WORKERS', 2))
+
+# Доля запросов, для которых собираются замеры (0 — выключено).
+PROFILING_SAMPLE_RATE = 0.0
+
+# Каталог, через который воркеры складывают метрики для /metrics.
+# Без него /metrics показывает только процесс, ответивший на запрос.
+METRICS_DIR = os.environ.get('METRICS_DIR')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'yatube.profiling': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+    },
+}
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
+# Адреса, которым видны debug_toolbar и /metrics (core/views.py).
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
\ No newline at end of file